@@ -1,8 +1,10 @@
 import json
 import sys
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
 from prom_query import query_prometheus
+import pythonmodule_path  # noqa: F401
+from http_client import get_client
 from dotenv import load_dotenv
 import os
 
@@ -21,6 +23,48 @@ function_spec_prometheus = {
             "promql": {
                 "type": "string",
                 "description": "Metric name to query in Prometheus (one of: 'active_UEs', 'amf_ue_registration_state', 'ue_destination_visits_total', 'UE_location_report')."
+            },
+            "aggregate": {
+                "type": "string",
+                "enum": ["handover_counts", "cell_dwell", "transition_matrix", "registration_uptime",
+                         "active_hourly", "visit_duration_stats"],
+                "description": (
+                    "Optional precomputed summary to return instead of the raw data. "
+                    "'handover_counts' (UE_location_report): handovers, distinct cells, mean dwell and top cell per UE. "
+                    "'cell_dwell' (UE_location_report): arrivals, distinct UEs and dwell minutes per cell. "
+                    "'transition_matrix' (UE_location_report): handover counts from cell to cell. "
+                    "'registration_uptime' (amf_ue_registration_state): registered minutes, uptime ratio and current state per SUPI. "
+                    "'active_hourly' (active_UEs): peak and mean active UEs per hour of day. "
+                    "'visit_duration_stats' (ue_destination_visits_total): visit duration stats per location_type. "
+                    "Use it whenever the question can be answered from the summary."
+                )
+            },
+            "start": {
+                "type": "string",
+                "description": "Optional start of the time window, e.g. '2025-03-04 10:00'. Omit for the full history."
+            },
+            "end": {
+                "type": "string",
+                "description": "Optional end of the time window, e.g. '2025-03-04 12:00'. Defaults to now."
+            },
+            "last": {
+                "type": "string",
+                "description": "Optional relative window ending at 'end' (or now), e.g. '30m', '2h', '3 days'. Overrides 'start'."
+            },
+            "supi": {
+                "type": "string",
+                "description": "Optional SUPI to restrict the data to one UE, e.g. '208930000000004'. "
+                               "Not applicable to 'active_UEs'."
+            },
+            "cell": {
+                "type": "integer",
+                "description": "Optional NrCellId to restrict 'UE_location_report' data to one cell, e.g. 40."
+            },
+            "resolution": {
+                "type": "string",
+                "description": "Optional bucket size for trends of 'active_UEs' or 'amf_ue_registration_state' "
+                               "over long windows, e.g. '1h' or '1d'. Returns min/max/mean/last active UEs "
+                               "(or uptime per SUPI) per bucket instead of every change."
             }
         },
         "required": ["promql"]
@@ -54,13 +98,40 @@ def nwdaf_subscription_command(action, target):
     Call NWDAF's command endpoint to perform subscribe/unsubscribe actions.
     Ensure that your NWDAF service exposes a REST endpoint (e.g., /nwdaf/command) to handle these commands.
     """
-    nwdaf_url = "http://127.0.0.71:8001/nwdaf/command"  # Replace with the actual NWDAF address.
+    # NWDAF address: NWDAF_COMMAND_URL (default http://127.0.0.71:8001). The shared client
+    # bounds the wait with timeouts, retries unsent requests and fails fast while NWDAF is down.
     payload = {"action": action, "target": target}
-    response = requests.post(nwdaf_url, json=payload)
+    response = get_client('nwdaf').post('/nwdaf/command', json=payload)
     print(action, target)
     # return {"status": "success", "action": action, "target": target}
     return response.json()
 
+# Tools the model may call, several per turn; they run concurrently and all
+# results go back in a single follow-up completion.
+TOOLS = [{"type": "function", "function": spec} for spec in (function_spec_prometheus, function_spec_subscription)]
+FUNCTIONS = {
+    "query_prometheus": query_prometheus,
+    "nwdaf_subscription_command": nwdaf_subscription_command,
+}
+MAX_TOOL_WORKERS = 4
+
+def run_tool_call(tool_call):
+    """ Execute one tool call and return its 'tool' message; errors are reported to the model, not raised. """
+    function_name = tool_call["function"]["name"]
+    try:
+        function_args = json.loads(tool_call["function"]["arguments"] or "{}")
+        result = FUNCTIONS[function_name](**function_args)
+    except Exception as e:
+        print(tool_call)
+        result = {"error": str(e), "status": "failed"}
+        print(result)
+    return {"role": "tool", "tool_call_id": tool_call["id"], "content": json.dumps(result)}
+
+def run_tool_calls(tool_calls):
+    """ All tool calls of one turn at once; messages come back in call order. """
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_TOOL_WORKERS, len(tool_calls)))) as pool:
+        return list(pool.map(run_tool_call, tool_calls))
+
 def run_llm_conversation(user_message):
     # Build the conversation messages with both function specs
     messages = [
@@ -86,9 +157,18 @@ def run_llm_conversation(user_message):
                 "CORRECT: query_prometheus(query='UE_location_report')\n"
                 "INCORRECT: query_prometheus(query='UE_location_report{supi=\"208930000000004\"}')\n"
                 "INCORRECT: query_prometheus(query='count(UE_location_report)')\n"
-                "\nDo not add any labels, functions, or modifiers to the metric name. The function only accepts the raw metric name."
-                "When the user asks about metrics, select the most appropriate metric from the four options above and pass ONLY the metric name. "
-                "The query_prometheus function will handle all filtering and processing internally."
+                "\nDo not add any labels, functions, or modifiers to the metric name. The function only accepts the raw metric name. "
+                "To restrict the data to one UE, one cell or a time window, use the separate 'supi', 'cell', "
+                "'start'/'end' or 'last' parameters instead, e.g. query_prometheus(promql='UE_location_report', "
+                "supi='208930000000004', last='1h'). Always pass them when the question is about a specific UE, "
+                "cell or period. "
+                "When the user asks about metrics, select the most appropriate metric from the four options above and pass ONLY the metric name as 'promql'. "
+                "The query_prometheus function will handle all filtering and processing internally. "
+                "For counts, rankings, averages, peaks or transitions, also pass the matching 'aggregate' so a compact "
+                "summary is returned instead of the raw data. For trends over days or weeks of 'active_UEs' or "
+                "'amf_ue_registration_state', pass a 'resolution' such as '1h' or '1d'. "
+                "When a question needs several metrics (e.g. location and registration state) or several "
+                "subscription commands, request all of the function calls together in the same turn."
             )
         },
         {
@@ -100,80 +180,26 @@ def run_llm_conversation(user_message):
     response = client.chat.completions.create(
         model="gpt-4o-mini",  # or 'gpt-3.5-turbo-0613'
         messages=messages,
-        functions=[function_spec_prometheus, function_spec_subscription],
-        function_call="auto"
+        tools=TOOLS,
+        tool_choice="auto",
+        parallel_tool_calls=True
     )
     response_dict = response.to_dict()
     response_message = response_dict["choices"][0]["message"]
 
-    if response_message.get("function_call"):
-        function_name = response_message["function_call"]["name"]
-        function_args_json = response_message["function_call"]["arguments"]
-        function_args = json.loads(function_args_json)
-
-        if function_name == "query_prometheus":
-            try:
-                prom_result = query_prometheus(**function_args)
-                # print(prom_result)
-                messages.append(response_message)
-                messages.append({
-                    "role": "function",
-                    "name": function_name,
-                    "content": json.dumps(prom_result)
-                })
-                second_response = client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=messages
-                )
-                return second_response.choices[0].message.content
-            except Exception as e:
-                error_message = {
-                    "role": "function",
-                    "name": function_name,
-                    "content": json.dumps({"error": str(e), "status": "failed"})
-                }
-                messages.append(response_message)
-                print(response_message)
-                print(error_message)
-                messages.append(error_message)
-                error_response = client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=messages
-                )
-                return error_response.choices[0].message.content
-
-        elif function_name == "nwdaf_subscription_command":
-            try:
-                sub_result = nwdaf_subscription_command(**function_args)
-                messages.append(response_message)
-                messages.append({
-                    "role": "function",
-                    "name": function_name,
-                    "content": json.dumps(sub_result)
-                })
-                second_response = client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=messages
-                )
-                return second_response.choices[0].message.content
-            except Exception as e:
-                error_message = {
-                    "role": "function",
-                    "name": function_name,
-                    "content": json.dumps({"error": str(e), "status": "failed"})
-                }
-                messages.append(response_message)
-                messages.append(error_message)
-                error_response = client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=messages
-                )
-                return error_response.choices[0].message.content
-
-    else:
+    tool_calls = response_message.get("tool_calls")
+    if not tool_calls:
         # If no function call is returned, just relay the LLM's plain text answer.
         return response_message["content"]
 
+    messages.append(response_message)
+    messages.extend(run_tool_calls(tool_calls))
+    second_response = client.chat.completions.create(
+        model="gpt-4o",
+        messages=messages
+    )
+    return second_response.choices[0].message.content
+
 if __name__ == "__main__":
     while True:
         try:
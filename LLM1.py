@@ -1,13 +1,16 @@
 import json
 import os
 import pickle
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 from dotenv import load_dotenv
 from openai import OpenAI
 import sys
-import requests
 from prom_query import query_prometheus
+import pythonmodule_path  # noqa: F401
+from http_client import get_client
+from intent_index import IntentIndex, load_intent_prompts
+from intent_router import IntentRouter, CONFIDENCE
+from vector_index import VectorIndex
+from embedding_cache import EmbeddingCache
 
 
 # Load environment variables
@@ -15,34 +18,17 @@ load_dotenv()
 api_key = os.getenv('API_KEY')
 client = OpenAI(api_key=api_key)
 
-# File to store cached embeddings
+EMBEDDING_MODEL = "text-embedding-ada-002"  # or "text-embedding-3-small"
+# Pickle cache of older versions; only read to seed a missing intent index
 EMBEDDINGS_FILE = "intent_embeddings.pkl"
+# Query embeddings by normalized text, in memory and on disk (embedding_cache.py)
+embedding_cache = EmbeddingCache(EMBEDDING_MODEL)
 
-def save_embeddings():
-    """ Save intent embeddings, categories, and mappings to a file. """
-    with open(EMBEDDINGS_FILE, "wb") as f:
-        pickle.dump((intent_embeddings, all_intents, all_categories, intent_to_category), f)
-
-def load_embeddings():
-    """ Load intent embeddings, categories, and mappings from a file. """
-    global intent_embeddings, all_intents, all_categories, intent_to_category
+def load_legacy_embeddings():
+    """ {intent: embedding} from an old intent_embeddings.pkl """
     with open(EMBEDDINGS_FILE, "rb") as f:
-        intent_embeddings, all_intents, all_categories, intent_to_category = pickle.load(f)
-    print(f"Loaded cached embeddings for {len(all_intents)} intents.")
-
-
-def load_intent_prompts(file_path):
-    intent_categories = {}
-    category = None
-    with open(file_path, 'r', encoding='utf-8') as file:
-        for line in file:
-            line = line.strip()
-            if line.startswith('##'):
-                category = line.strip('#').strip()
-                intent_categories[category] = []
-            elif category and line:
-                intent_categories[category].append(line.split('. ', 1)[-1])  # Remove numbering
-    return intent_categories
+        embeddings, intents, _, _ = pickle.load(f)
+    return dict(zip(intents, embeddings))
 
 intent_file_path = "intent prompts.txt"
 intent_categories = load_intent_prompts(intent_file_path)
@@ -52,84 +38,115 @@ all_intents = []
 all_categories = []
 intent_to_category = {}
 intent_embeddings = None
+intent_index = None
+intent_vectors = None
+intent_router = None
+# Local router probability needed to skip the embedding call (above 1 always uses embeddings)
+ROUTER_CONFIDENCE = float(os.getenv('INTENT_ROUTER_CONFIDENCE', CONFIDENCE))
 
 # Generate embeddings using OpenAI Embeddings API
 def get_embedding(text):
     response = client.embeddings.create(
         input=text,
-        model="text-embedding-ada-002"  # or "text-embedding-3-small" 
+        model=EMBEDDING_MODEL
     )
     return response.data[0].embedding
 
-# Generate and store embeddings for all intents
+def embed_texts(texts):
+    """ One embedding per text, in a single request """
+    response = client.embeddings.create(input=texts, model=EMBEDDING_MODEL)
+    return [item.embedding for item in response.data]
+
+# Map the intent index (intent_index.py), embedding only new or edited intents
 def prepare_intent_embeddings():
-    global all_intents, all_categories, intent_to_category, intent_embeddings
-    
-    # Check if embeddings file exists
-    if os.path.exists(EMBEDDINGS_FILE):
-        load_embeddings()
-        return
-
-    # Collect all intents and their categories
-    for category, intents in intent_categories.items():
-        for intent in intents:
-            all_intents.append(intent)
-            all_categories.append(category)
-            intent_to_category[intent] = category
-    
-    # Generate embeddings for all intents
-    print(f"Generating embeddings for {len(all_intents)} intents...")
-    intent_embeddings = []
-    
-    # Process in batches to avoid rate limits
-    batch_size = 20
-    for i in range(0, len(all_intents), batch_size):
-        batch = all_intents[i:i+batch_size]
-        batch_response = client.embeddings.create(
-            input=batch,
-            model="text-embedding-ada-002"
-        )
-        batch_embeddings = [item.embedding for item in batch_response.data]
-        intent_embeddings.extend(batch_embeddings)
-        print(f"Processed {i+len(batch)}/{len(all_intents)} intents")
-    
-    intent_embeddings = np.array(intent_embeddings)
-    # Save embeddings for future use
-    save_embeddings()
-    print(f"Generated embeddings for {len(all_intents)} intents")
+    global all_intents, all_categories, intent_to_category, intent_embeddings, intent_index, intent_vectors
+
+    seed = None
+    if IntentIndex.open() is None and os.path.exists(EMBEDDINGS_FILE):
+        seed = load_legacy_embeddings()
+    intent_index, embedded = IntentIndex.update(intent_categories, embed_texts, EMBEDDING_MODEL, seed=seed)
+
+    all_intents = intent_index.texts
+    all_categories = intent_index.categories
+    intent_to_category = dict(zip(all_intents, all_categories))
+    intent_embeddings = intent_index.embeddings     # memory-mapped float32 matrix
+    # normalized once here, so a query is one matrix-vector product (IVF from 100k intents on)
+    intent_vectors = VectorIndex(intent_embeddings, nlist='auto')
+    print(f"Intent index v{intent_index.version}: {len(all_intents)} intents, {embedded} newly embedded")
 
 def get_best_intent_match_rag(user_query):
     """Use RAG approach to find the best matching intent"""
-    # Get query embedding
-    query_embedding = get_embedding(user_query)
-    # Calculate similarity with all intents
-    similarities = cosine_similarity([query_embedding], intent_embeddings)[0]
-    
+    # Get query embedding (repeated questions come from the cache)
+    query_embedding = embedding_cache.get(user_query, get_embedding)
+    # Top 3 intents by cosine similarity, best first
+    top_indices, top_scores = intent_vectors.search(query_embedding, k=3)
+    top_indices, top_scores = top_indices[0], top_scores[0]
+
     # Get most similar intent
-    best_idx = np.argmax(similarities)
-    best_match = all_intents[best_idx]
-    best_score = similarities[best_idx]
+    best_match = all_intents[top_indices[0]]
+    best_score = top_scores[0]
     
     # Find the category of the matched intent
     category = intent_to_category.get(best_match)
     
-    # Get top 3 matches for logging/debugging
-    top_indices = similarities.argsort()[-3:][::-1]
-    top_intents = [all_intents[idx] for idx in top_indices]
-    top_scores = [similarities[idx] for idx in top_indices]
-    top_matches = list(zip(top_intents, top_scores))
+    # Top 3 matches for logging/debugging
+    top_matches = list(zip([all_intents[idx] for idx in top_indices], top_scores))
     
     return best_match, category#, best_score, top_matches
 
+# Train the local intent router (intent_router.py) on the same catalog
+def prepare_intent_router():
+    global intent_router
+    intent_router = IntentRouter.train(intent_categories)
+
+def route_query(user_query):
+    """Local router when it is confident, embedding search otherwise"""
+    if intent_router is not None:
+        # closest catalog intent of the predicted category, like the embedding path returns
+        intent, category, confidence = intent_router.match(user_query)
+        if confidence >= ROUTER_CONFIDENCE:
+            print(f"Routed locally (p={confidence:.2f})")
+            return intent, category
+    return get_best_intent_match_rag(user_query)
+
 def nwdaf_subscription_command(action, target):
     """ Send NWDAF subscription command """
-    nwdaf_url = "http://127.0.0.71:8001/nwdaf/command"
     payload = {"action": action, "target": target}
-    response = requests.post(nwdaf_url, json=payload)
+    # shared NWDAF client (http_client.py): timeouts, retries and a circuit breaker
+    response = get_client('nwdaf').post('/nwdaf/command', json=payload)
     return response.json()
 
+# Categories whose answer is rendered from the function result instead of a
+# second gpt-4o completion; the NWDAF command reply already says what happened.
+# Set a category to False to have gpt-4o phrase it again.
+TEMPLATED_CATEGORIES = {
+    "AMF Subscribe": True,
+    "AMF Unsubscribe": True,
+    "SMF Subscribe": True,
+    "SMF Unsubscribe": True,
+    "Active_UEs": False,
+    "UE_location_report": False,
+    "Registration State": False,
+}
+# /nwdaf/command replies are {"message": ...} or {"error": ...}
+RESPONSE_TEMPLATES = {
+    "message": "{message}",
+    "error": "{target} {action} failed: {error}",
+}
+
+def template_response(category, function_result):
+    """ Answer for a templated category, or None when the result has no template """
+    if not isinstance(function_result, dict):
+        return None
+    target, action = category.split(" ", 1)
+    for key, template in RESPONSE_TEMPLATES.items():
+        if function_result.get(key):
+            text = template.format(target=target, action=action.lower(), **{key: function_result[key]})
+            return text[0].upper() + text[1:]
+    return None
+
 def process_user_query(user_query):
-    best_intent, category= get_best_intent_match_rag(user_query)
+    best_intent, category= route_query(user_query)
     if not best_intent:
         return {"error": "No matching intent found."}
     
@@ -150,6 +167,12 @@ def process_user_query(user_query):
         function_result = query_prometheus("amf_ue_registration_state")
     else:
         return {"error": "Unknown category match."}
+
+    # Control actions are answered directly; only analytics need the second completion
+    if TEMPLATED_CATEGORIES.get(category):
+        answer = template_response(category, function_result)
+        if answer is not None:
+            return answer
     
     # Feed the function result back into OpenAI for interpretation
     messages = [
@@ -166,6 +189,7 @@ def process_user_query(user_query):
 if __name__ == "__main__":
     # Prepare embeddings first
     prepare_intent_embeddings()
+    prepare_intent_router()
     while True:
         try:
             user_question = input("\nEnter your query (Ctrl+C to exit): ")
@@ -175,5 +199,6 @@ if __name__ == "__main__":
             response = process_user_query(user_question)
             print("Response:", response)
         except KeyboardInterrupt:
-            print("\nExiting...")
+            print("\nEmbedding cache:", embedding_cache.stats())
+            print("Exiting...")
             sys.exit(0)
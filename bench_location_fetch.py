@@ -0,0 +1,61 @@
+# bench_location_fetch.py
+#
+# Compare the two ways of reading UE_location_report events from Prometheus:
+#   matrix  query_range at a 5m step, then read entry['metric'] (the old path)
+#   series  /api/v1/series, labels only (get_df_location(labels_only=True))
+# Reports response size, transfer and JSON decode time, and checks that both
+# paths find the same events.
+#
+#   python3 bench_location_fetch.py [--days 10] [--repeat 3] [--url http://localhost:9090]
+
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+LABELS = ('time', 'NrCellId', 'supi', 'tac')
+
+
+def fetch(url, path, params):
+    start = time.perf_counter()
+    response = requests.get(url + path, params=params, timeout=300)
+    response.raise_for_status()
+    transfer = time.perf_counter() - start
+    start = time.perf_counter()
+    body = json.loads(response.content)
+    decode = time.perf_counter() - start
+    return len(response.content), transfer, decode, body['data']
+
+
+def bench(url, start, end, repeat):
+    modes = {
+        'matrix': ('/api/v1/query_range', {'query': 'UE_location_report', 'start': start, 'end': end, 'step': 300},
+                   lambda data: [entry['metric'] for entry in data['result']]),
+        'series': ('/api/v1/series', {'match[]': 'UE_location_report', 'start': start, 'end': end},
+                   lambda data: data),
+    }
+    events = {}
+    print(f"{'mode':<8} {'bytes':>12} {'transfer [s]':>13} {'decode [s]':>11} {'events':>8}")
+    for mode, (path, params, labels_of) in modes.items():
+        runs = [fetch(url, path, params) for _ in range(repeat)]
+        size, data = runs[0][0], runs[0][3]
+        events[mode] = {tuple(m.get(k) for k in LABELS) for m in labels_of(data)}
+        print(f"{mode:<8} {size:>12,} {statistics.median(r[1] for r in runs):>13.4f} "
+              f"{statistics.median(r[2] for r in runs):>11.4f} {len(events[mode]):>8}")
+    same = events['matrix'] == events['series']
+    print("same events:", same if same else
+          f"no ({len(events['matrix'] - events['series'])} only in matrix, "
+          f"{len(events['series'] - events['matrix'])} only in series)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark UE_location_report extraction paths.")
+    parser.add_argument('--url', default='http://localhost:9090')
+    parser.add_argument('--days', type=float, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    end = datetime.now()
+    bench(args.url, (end - timedelta(days=args.days)).timestamp(), end.timestamp(), args.repeat)
@@ -1,9 +1,18 @@
+import os
+import sys
+
 import pandas as pd
 import matplotlib.pyplot as plt
 
-# Load datasets
-handover_df = pd.read_csv("df_location.csv", parse_dates=["time"])
-session_df = pd.read_csv("df_active.csv", parse_dates=["timestamp"])
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, '..', '..', 'mnc_NWDAF-main', 'NWDAF', 'pythonmodule'))
+from core_dataset import load  # noqa: E402
+
+# Load datasets (typed Parquet copy, see core_dataset.py; `python3 core_dataset.py convert` builds it,
+# until then the period's CSVs are read)
+PERIOD = os.path.basename(HERE)
+handover_df = load("location", columns=["time", "NrCellId", "supi"], source=PERIOD)
+session_df = load("active", columns=["timestamp", "active_UEs", "duration"], source=PERIOD)
 
 # Figure 1: Handover Frequency Over Time
 handover_df["hour"] = handover_df["time"].dt.hour
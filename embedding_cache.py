@@ -0,0 +1,122 @@
+# embedding_cache.py
+#
+# Query embedding cache for LLM1.py. Operators repeat the same questions all
+# day, so the embeddings request before intent routing is looked up first in:
+#
+#   memory   LRU of the latest MEMORY_SIZE queries in this process
+#   disk     SQLite file (LLM_EMBEDDING_CACHE, default embedding_cache.db) of the
+#            latest DISK_SIZE queries, shared across runs; least recently used rows
+#            are evicted past that
+#
+# Queries are keyed by model and normalized text (Unicode NFKC, case-folded,
+# whitespace collapsed, trailing ?/!/. dropped), so "Subscribe AMF?" and
+# "subscribe  amf" share one entry.
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+from intent_index import content_hash
+
+CACHE_PATH = os.getenv('LLM_EMBEDDING_CACHE', 'embedding_cache.db')
+MEMORY_SIZE = 1024
+DISK_SIZE = 100_000     # ~600 MB of 1536-d float32 vectors at most
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key TEXT PRIMARY KEY, query TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+"""
+
+
+def normalize_query(text):
+    text = unicodedata.normalize('NFKC', text).casefold()
+    return re.sub(r'\s+', ' ', text).strip().rstrip('?!. ')
+
+
+class EmbeddingCache:
+
+    def __init__(self, model, path=CACHE_PATH, memory_size=MEMORY_SIZE, disk_size=DISK_SIZE):
+        """ `path=None` keeps the cache in memory only. """
+        self.model = model
+        self.path = path
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.memory = OrderedDict()
+        self.counts = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        if path is not None:
+            with self._db() as db:
+                db.execute('PRAGMA journal_mode=WAL')
+                db.executescript(SCHEMA)
+
+    @contextmanager
+    def _db(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _remember(self, key, vector):
+        with self._lock:
+            self.memory[key] = vector
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_size:
+                self.memory.popitem(last=False)
+
+    def get(self, text, embed):
+        """ Embedding of `text`, calling `embed(text)` only when neither tier has it. """
+        query = normalize_query(text)
+        key = content_hash(query, self.model)
+        with self._lock:
+            vector = self.memory.get(key)
+            if vector is not None:
+                self.memory.move_to_end(key)
+                self.counts['memory_hits'] += 1
+                return vector
+
+        if self.path is not None:
+            with self._db() as db:
+                row = db.execute('SELECT vector FROM embeddings WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    db.execute('UPDATE embeddings SET last_used = ? WHERE key = ?', (time.time(), key))
+            if row is not None:
+                vector = np.frombuffer(row[0], dtype=np.float32)
+                self._remember(key, vector)
+                with self._lock:
+                    self.counts['disk_hits'] += 1
+                return vector
+
+        vector = np.asarray(embed(text), dtype=np.float32)
+        with self._lock:
+            self.counts['misses'] += 1
+        self._remember(key, vector)
+        if self.path is not None:
+            with self._db() as db:
+                db.execute('INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)',
+                           (key, query, vector.tobytes(), time.time()))
+                evicted = db.execute('DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings '
+                                     'ORDER BY last_used DESC LIMIT -1 OFFSET ?)', (self.disk_size,)).rowcount
+            with self._lock:
+                self.counts['evictions'] += evicted
+        return vector
+
+    def stats(self):
+        """ Hit/miss counters, hit rate and tier sizes. """
+        with self._lock:
+            summary = dict(self.counts, memory_entries=len(self.memory))
+        lookups = summary['memory_hits'] + summary['disk_hits'] + summary['misses']
+        summary['hit_rate'] = round((lookups - summary['misses']) / lookups, 3) if lookups else None
+        if self.path is not None:
+            with self._db() as db:
+                summary['disk_entries'] = db.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        return summary
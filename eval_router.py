@@ -0,0 +1,108 @@
+# eval_router.py
+#
+# Routing accuracy and latency of the two intent paths of LLM1.py on a
+# held-out prompt file (same `## Category` format as `intent prompts.txt`):
+#   local       intent_router.IntentRouter trained on `intent prompts.txt`
+#   embeddings  one embeddings request per query + top-1 search over the intent index
+#   hybrid      local when its probability reaches the threshold, embeddings otherwise
+# The embedding path needs API_KEY (and makes one request per test prompt);
+# without it, or with --local-only, only the local router is evaluated.
+#
+#   python3 eval_router.py [--test test_prompts.txt] [--threshold 0.7] [--local-only]
+
+import argparse
+import os
+import statistics
+import time
+
+import numpy as np
+
+from intent_index import load_intent_prompts
+from intent_router import CONFIDENCE, IntentRouter
+
+
+def latency_summary(seconds):
+    us = np.array(seconds) * 1e6
+    return (f"p50 {np.percentile(us, 50):10.1f} us   p99 {np.percentile(us, 99):10.1f} us   "
+            f"mean {us.mean():10.1f} us")
+
+
+def per_category(labels, predicted):
+    rows = []
+    for category in dict.fromkeys(labels):
+        mask = labels == category
+        rows.append(f"    {category:<20} {np.mean(predicted[mask] == category):.3f}")
+    return '\n'.join(rows)
+
+
+def embedding_path(texts):
+    """ Top-1 category and latency per text through LLM1's embedding search, uncached. """
+    import LLM1
+
+    LLM1.prepare_intent_embeddings()
+    categories, seconds = [], []
+    for text in texts:
+        start = time.perf_counter()
+        indices, _ = LLM1.intent_vectors.search(LLM1.get_embedding(text), k=1)
+        seconds.append(time.perf_counter() - start)
+        categories.append(LLM1.all_categories[indices[0][0]])
+    return np.array(categories), seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the local intent router against embedding search.")
+    parser.add_argument('--train', default='intent prompts.txt')
+    parser.add_argument('--test', default='test_prompts.txt')
+    parser.add_argument('--threshold', type=float, default=CONFIDENCE)
+    parser.add_argument('--repeat', type=int, default=5, help="timing runs of the local router (best is kept)")
+    parser.add_argument('--local-only', action='store_true')
+    args = parser.parse_args()
+
+    test = load_intent_prompts(args.test)
+    texts = [text for texts in test.values() for text in texts]
+    labels = np.array([category for category, texts in test.items() for _ in texts])
+
+    start = time.perf_counter()
+    router = IntentRouter.train(load_intent_prompts(args.train))
+    print(f"Trained on {args.train} in {time.perf_counter() - start:.2f}s; {len(texts)} test prompts from {args.test}")
+
+    seconds = [float('inf')] * len(texts)
+    for _ in range(args.repeat):
+        for i, text in enumerate(texts):
+            started = time.perf_counter()
+            router.match(text)      # what LLM1.route_query runs: category plus closest intent
+            seconds[i] = min(seconds[i], time.perf_counter() - started)
+    results = [router.match(text) for text in texts]
+    local = np.array([category for _, category, _ in results])
+    confidence = np.array([p for _, _, p in results])
+    print(f"\nlocal       accuracy {np.mean(local == labels):.3f}   {latency_summary(seconds)}")
+    print(per_category(labels, local))
+    print("\n  threshold   routed locally   local accuracy when routed")
+    for threshold in sorted({0.5, 0.6, 0.7, 0.8, 0.9, args.threshold}):
+        routed = confidence >= threshold
+        accuracy = np.mean(local[routed] == labels[routed]) if routed.any() else float('nan')
+        print(f"  {threshold:9.2f}   {routed.mean():14.3f}   {accuracy:.3f}")
+
+    if args.local_only:
+        return
+    if not os.getenv('API_KEY') and not os.path.exists('.env'):
+        print("\nembeddings  skipped: API_KEY is not set (see --local-only)")
+        return
+    try:
+        remote, remote_seconds = embedding_path(texts)
+    except Exception as e:
+        print(f"\nembeddings  skipped: {type(e).__name__}: {e}")
+        return
+    print(f"\nembeddings  accuracy {np.mean(remote == labels):.3f}   {latency_summary(remote_seconds)}")
+    print(per_category(labels, remote))
+
+    routed = confidence >= args.threshold
+    hybrid = np.where(routed, local, remote)
+    hybrid_seconds = [s + (0 if r else remote_s) for s, r, remote_s in zip(seconds, routed, remote_seconds)]
+    print(f"\nhybrid      accuracy {np.mean(hybrid == labels):.3f}   {latency_summary(hybrid_seconds)}   "
+          f"(threshold {args.threshold}, {routed.mean():.0%} local, "
+          f"median embedding call {statistics.median(remote_seconds) * 1e3:.0f} ms)")
+
+
+if __name__ == '__main__':
+    main()
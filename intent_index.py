@@ -0,0 +1,151 @@
+# intent_index.py
+#
+# On-disk intent embedding index for LLM1.py, replacing intent_embeddings.pkl:
+#
+#   intent_index/manifest.json        version, embedding model, dimension and one
+#                                     {hash, text, category} entry per matrix row
+#   intent_index/embeddings-<v>.npy   float32 matrix, opened with mmap_mode='r'
+#
+# Every intent is keyed by a content hash of (model, text). Updating the index
+# from `intent prompts.txt` reuses the rows of unchanged intents and embeds only
+# new or edited ones. Startup reads the JSON manifest and maps the matrix
+# without unpickling anything. A new version is written next to the old one
+# and the manifest is swapped atomically, so a running reader keeps a
+# consistent view.
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+INDEX_DIR = os.getenv('INTENT_INDEX_DIR', 'intent_index')
+MANIFEST = 'manifest.json'
+BATCH_SIZE = 256        # intents per embeddings request (the API takes up to 2048 inputs)
+
+
+def content_hash(text, model):
+    return hashlib.sha256(f'{model}\0{text}'.encode('utf-8')).hexdigest()
+
+
+def load_intent_prompts(file_path):
+    """ `## Category` headers followed by numbered intents -> {category: [intent, ...]} """
+    intent_categories = {}
+    category = None
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if line.startswith('##'):
+                category = line.strip('#').strip()
+                intent_categories[category] = []
+            elif category and line:
+                intent_categories[category].append(line.split('. ', 1)[-1])  # Remove numbering
+    return intent_categories
+
+
+def catalog_entries(intent_categories, model):
+    """ {category: [intent, ...]} -> [(hash, text, category)] in catalog order """
+    return [(content_hash(text, model), text, category)
+            for category, texts in intent_categories.items() for text in texts]
+
+
+class IntentIndex:
+
+    def __init__(self, path, manifest, embeddings):
+        self.path = path
+        self.manifest = manifest
+        self.embeddings = embeddings
+        self.hashes = [entry['hash'] for entry in manifest['entries']]
+        self.texts = [entry['text'] for entry in manifest['entries']]
+        self.categories = [entry['category'] for entry in manifest['entries']]
+
+    @property
+    def version(self):
+        return self.manifest['version']
+
+    @classmethod
+    def open(cls, path=INDEX_DIR):
+        """ Map the current version, or None when there is no index yet. """
+        try:
+            with open(os.path.join(path, MANIFEST), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        embeddings = np.load(os.path.join(path, manifest['matrix']), mmap_mode='r', allow_pickle=False)
+        if embeddings.shape != (len(manifest['entries']), manifest['dim']):
+            raise ValueError(f"{path}: matrix {embeddings.shape} does not match the manifest")
+        return cls(path, manifest, embeddings)
+
+    def same_vectors(self, entries, model):
+        """ The matrix rows are exactly the embeddings of `entries`, in order. """
+        return self.manifest['model'] == model and self.hashes == [h for h, _, _ in entries]
+
+    def is_current(self, entries, model):
+        return (self.same_vectors(entries, model)
+                and list(zip(self.hashes, self.categories)) == [(h, category) for h, _, category in entries])
+
+    @classmethod
+    def update(cls, intent_categories, embed, model, path=INDEX_DIR, seed=None, batch_size=BATCH_SIZE):
+        """
+        Index for the given catalog, embedding only intents whose hash is not
+        in the current version (or in `seed`, {text: vector} from an older
+        cache). `embed(texts)` returns one vector per text. Returns the index
+        and the number of intents that were embedded.
+        """
+        entries = catalog_entries(intent_categories, model)
+        current = cls.open(path)
+        if current is not None and current.is_current(entries, model):
+            return current, 0
+        if current is not None and current.same_vectors(entries, model):
+            # only categories changed (renamed header, intent moved): new manifest over the same matrix
+            manifest = dict(current.manifest, version=current.version + 1,
+                            entries=[{'hash': h, 'text': text, 'category': category} for h, text, category in entries])
+            cls._write(path, manifest, previous=current.manifest['matrix'])
+            return cls.open(path), 0
+
+        known = {}
+        if current is not None and current.manifest['model'] == model:
+            known = {h: row for row, h in enumerate(current.hashes)}
+        seeded = {content_hash(text, model): np.asarray(vector, dtype=np.float32)
+                  for text, vector in (seed or {}).items()}
+        missing = list(dict.fromkeys(h for h, _, _ in entries if h not in known and h not in seeded))
+        text_of = {h: text for h, text, _ in entries}
+        fresh = {}
+        for i in range(0, len(missing), batch_size):
+            batch = missing[i:i + batch_size]
+            fresh.update(zip(batch, (np.asarray(v, dtype=np.float32) for v in embed([text_of[h] for h in batch]))))
+            print(f"Embedded {min(i + batch_size, len(missing))}/{len(missing)} new intents")
+
+        def vector(h):
+            if h in fresh:
+                return fresh[h]
+            if h in known:
+                return current.embeddings[known[h]]
+            return seeded[h]
+
+        matrix = np.vstack([vector(h) for h, _, _ in entries]).astype(np.float32) if entries \
+            else np.zeros((0, current.manifest['dim'] if current else 0), dtype=np.float32)
+        version = (current.version + 1) if current is not None else 1
+        manifest = {
+            'version': version, 'model': model, 'dim': int(matrix.shape[1]),
+            'matrix': f'embeddings-{version}.npy',
+            'entries': [{'hash': h, 'text': text, 'category': category} for h, text, category in entries],
+        }
+        cls._write(path, manifest, matrix, previous=current.manifest['matrix'] if current is not None else None)
+        return cls.open(path), len(missing)
+
+    @staticmethod
+    def _write(path, manifest, matrix=None, previous=None):
+        """ Save `matrix` (None: the manifest points at an existing one) and swap the manifest in. """
+        os.makedirs(path, exist_ok=True)
+        if matrix is not None:
+            np.save(os.path.join(path, manifest['matrix']), matrix, allow_pickle=False)
+        tmp = os.path.join(path, MANIFEST + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, os.path.join(path, MANIFEST))
+        # keep only the new matrix and the one before it (still mapped by running readers)
+        keep = {manifest['matrix'], previous}
+        for name in os.listdir(path):
+            if name.startswith('embeddings-') and name.endswith('.npy') and name not in keep:
+                os.remove(os.path.join(path, name))
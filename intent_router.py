@@ -0,0 +1,125 @@
+# intent_router.py
+#
+# Local intent router for LLM1.py: a multinomial logistic regression over
+# hashed n-gram features, trained from the categories of `intent prompts.txt`.
+# It runs on the CPU with no network, so confident queries skip the remote
+# embedding call; the rest fall back to embedding search
+# (LLM1.get_best_intent_match_rag).
+#
+# Features are character 2-5-grams inside word boundaries plus word 1-2-grams,
+# hashed (crc32) into N_FEATURES buckets and L2-normalized per kind. Scoring a
+# query gathers the weight columns of its buckets, so it costs tens of
+# microseconds; scikit-learn is only needed to train.
+#
+#   python3 eval_router.py     # accuracy and latency on test_prompts.txt
+
+import re
+import zlib
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+N_FEATURES = 2 ** 16
+CHAR_NGRAMS = (2, 5)
+WORD_NGRAMS = (1, 2)
+CONFIDENCE = 0.7        # below this top probability the caller should fall back to embeddings
+REGULARIZATION = 1.0    # inverse strength (C); stronger regularization keeps probabilities calibrated
+
+
+def _normalized(counts):
+    ids = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    norm = np.linalg.norm(values)
+    return ids, values / norm if norm else values
+
+
+@lru_cache(maxsize=65536)
+def _char_grams(word):
+    """ Bucket ids of the character n-grams of one word (operator vocabulary is small, so this is mostly cached). """
+    padded = f' {word} '.encode()
+    return tuple(zlib.crc32(padded[i:i + n]) % (N_FEATURES // 2)
+                 for n in range(CHAR_NGRAMS[0], CHAR_NGRAMS[1] + 1) for i in range(len(padded) - n + 1))
+
+
+def features(text):
+    """ (bucket ids, values) of a text; the two feature kinds occupy separate halves of the space. """
+    words = re.findall(r'\w+', text.lower())
+    half = N_FEATURES // 2
+    chars = Counter()
+    for word in words:
+        chars.update(_char_grams(word))
+    grams = Counter(half + zlib.crc32(' '.join(words[i:i + n]).encode()) % half
+                    for n in range(WORD_NGRAMS[0], WORD_NGRAMS[1] + 1) for i in range(len(words) - n + 1))
+    char_ids, char_values = _normalized(chars)
+    word_ids, word_values = _normalized(grams)
+    return np.concatenate([char_ids, word_ids]), np.concatenate([char_values, word_values])
+
+
+def feature_matrix(texts):
+    from scipy.sparse import csr_matrix
+
+    rows = [features(text) for text in texts]
+    indptr = np.cumsum([0] + [len(ids) for ids, _ in rows])
+    ids = np.concatenate([ids for ids, _ in rows]) if rows else np.zeros(0, dtype=np.int64)
+    values = np.concatenate([values for _, values in rows]) if rows else np.zeros(0, dtype=np.float32)
+    return csr_matrix((values, ids, indptr), shape=(len(rows), N_FEATURES))
+
+
+class IntentRouter:
+
+    def __init__(self, categories, coef, intercept, intent_categories=None):
+        self.categories = [str(category) for category in categories]
+        self.weights = np.ascontiguousarray(coef.T, dtype=np.float32)    # (N_FEATURES, classes)
+        self.intercept = np.asarray(intercept, dtype=np.float32)
+        # per category: its intents, bucket id -> row of the category's own
+        # buckets (-1 elsewhere) and their dense (buckets, intents) feature matrix
+        self.intents = {}
+        for category, texts in (intent_categories or {}).items():
+            matrix = feature_matrix(texts)
+            columns = np.unique(matrix.indices)
+            lookup = np.full(N_FEATURES, -1, dtype=np.int32)
+            lookup[columns] = np.arange(len(columns))
+            self.intents[category] = (list(texts), lookup, np.ascontiguousarray(matrix[:, columns].T.toarray(), dtype=np.float32))
+
+    @classmethod
+    def train(cls, intent_categories, C=REGULARIZATION):
+        """ Fit on {category: [intent, ...]} (load_intent_prompts). """
+        from sklearn.linear_model import LogisticRegression
+
+        texts = [text for texts in intent_categories.values() for text in texts]
+        labels = [category for category, texts in intent_categories.items() for _ in texts]
+        model = LogisticRegression(C=C, max_iter=2000).fit(feature_matrix(texts), labels)
+        return cls(model.classes_, model.coef_, model.intercept_, intent_categories)
+
+    def _probabilities(self, ids, values):
+        logits = values @ self.weights[ids] + self.intercept
+        exp = np.exp(logits - logits.max())
+        return exp / exp.sum()
+
+    def probabilities(self, text):
+        return self._probabilities(*features(text))
+
+    def predict(self, text):
+        """ (category, probability) of the most likely category. """
+        probabilities = self.probabilities(text)
+        best = int(np.argmax(probabilities))
+        return self.categories[best], float(probabilities[best])
+
+    def _closest_intent(self, category, ids, values):
+        texts, lookup, matrix = self.intents[category]
+        rows = lookup[ids]
+        shared = rows >= 0
+        return texts[int(np.argmax(values[shared] @ matrix[rows[shared]]))]
+
+    def match(self, text):
+        """
+        (intent, category, probability): the most likely category and its
+        training intent with the most n-grams in common with `text`.
+        """
+        ids, values = features(text)
+        probabilities = self._probabilities(ids, values)
+        best = int(np.argmax(probabilities))
+        category = self.categories[best]
+        intent = self._closest_intent(category, ids, values) if category in self.intents else None
+        return intent, category, float(probabilities[best])
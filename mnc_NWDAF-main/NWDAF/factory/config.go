@@ -34,9 +34,10 @@ const (
 )
 
 type Configuration struct {
-	NwdafName string `yaml:"nwdafName,omitempty"`
-	Sbi       *Sbi   `yaml:"sbi,omitempty"`
-	NrfUri    string `yaml:"nrfUri,omitempty"`
+	NwdafName          string `yaml:"nwdafName,omitempty"`
+	Sbi                *Sbi   `yaml:"sbi,omitempty"`
+	NrfUri             string `yaml:"nrfUri,omitempty"`
+	AnalyticsWorkerUri string `yaml:"analyticsWorkerUri,omitempty"` // pythonmodule/main.py --serve
 }
 
 func (c *Config) GetVersion() string {
@@ -3,15 +3,22 @@ package producer
 import (
 	"bytes"
 	"encoding/json"
+	"errors"
 	"fmt"
+	"io"
 	"log"
 	"net/http"
 	"os/exec"
 	"time"
 
 	"github.com/gin-gonic/gin"
+	"nwdaf.com/factory"
 )
 
+// Client for the warm analytics worker; a request that takes longer than
+// this falls back to spawning the script.
+var analyticsWorkerClient = &http.Client{Timeout: 30 * time.Second}
+
 // AnalyticsRequest represents the incoming analytics request
 type AnalyticsRequest struct {
 	AnalyticsID    string    `json:"analyticsId"`
@@ -21,10 +28,11 @@ type AnalyticsRequest struct {
 }
 
 type PredictionRequest struct {
-	AnalyticsID    string `json:"analyticsId"`
-	TargetUe       string `json:"TargetUe"`
-	RequestingNfID string `json:"requestingNfId"`
-	TargetTime     string `json:"TargetTime"`
+	AnalyticsID    string      `json:"analyticsId"`
+	TargetUe       interface{} `json:"TargetUe"` // one SUPI, a list of SUPIs or "all"
+	RequestingNfID string      `json:"requestingNfId"`
+	TargetTime     string      `json:"TargetTime"`
+	Horizon        int         `json:"Horizon,omitempty"` // forecast steps for ACTIVE_UE_FORECAST
 }
 
 func HandleAnalyticsRequest(c *gin.Context) { //, w http.ResponseWriter, r *http.Request) {
@@ -140,33 +148,28 @@ func handleAnalyticsGet(w http.ResponseWriter, r *http.Request) {
 	// 	return
 	// }
 
-	pythonScript := "pythonmodule/main.py"
-
-	// Create the command
-	cmd := exec.Command("python3", pythonScript, req.ToString())
-
-	// Capture the output
-	// var out bytes.Buffer
-	var out, errOut bytes.Buffer
-	cmd.Stdout = &out
-	// cmd.Stderr = &out
-	cmd.Stderr = &errOut
-
-	// Run the command
-	err := cmd.Run()
+	out, err := runAnalytics(&req)
+	var workerErr *analyticsWorkerError
+	if errors.As(err, &workerErr) {
+		// The worker rejected the request itself; hand its answer to the consumer
+		w.Header().Set("Content-Type", "application/json")
+		w.WriteHeader(workerErr.status)
+		w.Write(workerErr.body)
+		return
+	}
 	if err != nil {
-		log.Fatalf("Error running Python script: %v\nError Output: %s", err, errOut.String())
+		log.Fatalf("Error running Python script: %v", err)
 	}
 
 	// Print the output
-	fmt.Println(out.String())
+	fmt.Println(out)
 
 	// Process GET request (implement your analytics retrieval logic here)
 	response := AnalyticsResponse{
 		AnalyticsID: req.AnalyticsID,
 		Timestamp:   time.Now(),
 		AnalyticsData: map[string]interface{}{
-			"result": fmt.Sprintf("Analytics data: %s", out.String()),
+			"result": fmt.Sprintf("Analytics data: %s", out),
 			// Add your actual analytics data here
 		},
 		Status: "COMPLETED",
@@ -176,6 +179,75 @@ func handleAnalyticsGet(w http.ResponseWriter, r *http.Request) {
 	json.NewEncoder(w).Encode(response)
 }
 
+// analyticsWorkerError is a non-200 answer of the analytics worker.
+type analyticsWorkerError struct {
+	status int
+	body   []byte
+}
+
+func (e *analyticsWorkerError) Error() string {
+	return fmt.Sprintf("analytics worker returned %d: %s", e.status, e.body)
+}
+
+// runAnalytics asks the warm analytics worker first and only spawns
+// pythonmodule/main.py when no worker is configured, it is unreachable or it
+// fails with a 5xx. Any other non-200 answer (a 400 for an invalid request)
+// is returned as *analyticsWorkerError: the script would reject it as well.
+func runAnalytics(req *PredictionRequest) (string, error) {
+	if uri := analyticsWorkerUri(); uri != "" {
+		out, err := postAnalyticsWorker(uri, req)
+		if err == nil {
+			return out, nil
+		}
+		var workerErr *analyticsWorkerError
+		if errors.As(err, &workerErr) && workerErr.status < http.StatusInternalServerError {
+			return "", err
+		}
+		log.Printf("Analytics worker at %s unavailable, spawning script: %v", uri, err)
+	}
+
+	pythonScript := "pythonmodule/main.py"
+
+	// Create the command
+	cmd := exec.Command("python3", pythonScript, req.ToString())
+
+	// Capture the output
+	// var out bytes.Buffer
+	var out, errOut bytes.Buffer
+	cmd.Stdout = &out
+	// cmd.Stderr = &out
+	cmd.Stderr = &errOut
+
+	// Run the command
+	if err := cmd.Run(); err != nil {
+		return "", fmt.Errorf("%v\nError Output: %s", err, errOut.String())
+	}
+	return out.String(), nil
+}
+
+func analyticsWorkerUri() string {
+	if factory.NwdafConfig == nil || factory.NwdafConfig.Configuration == nil {
+		return ""
+	}
+	return factory.NwdafConfig.Configuration.AnalyticsWorkerUri
+}
+
+func postAnalyticsWorker(uri string, req *PredictionRequest) (string, error) {
+	resp, err := analyticsWorkerClient.Post(uri, "application/json", bytes.NewBufferString(req.ToString()))
+	if err != nil {
+		return "", err
+	}
+	defer resp.Body.Close()
+	body, err := io.ReadAll(resp.Body)
+	if err != nil {
+		return "", err
+	}
+	if resp.StatusCode != http.StatusOK {
+		return "", &analyticsWorkerError{status: resp.StatusCode, body: body}
+	}
+	return string(body), nil
+}
+
 // Middleware for validating 5G Core Network Function authentication
 func authMiddleware(next http.HandlerFunc) http.HandlerFunc {
 	return func(w http.ResponseWriter, r *http.Request) {
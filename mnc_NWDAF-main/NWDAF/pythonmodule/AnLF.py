@@ -1,55 +1,73 @@
 from collections import defaultdict
 from datetime import datetime
+import threading
 
+import numpy as np
 import pandas as pd
-from sklearn.calibration import LabelEncoder
+from sklearn.preprocessing import LabelEncoder
 from sklearn.linear_model import LinearRegression, LogisticRegression
 from sklearn.model_selection import train_test_split
-from Model import *
 import os.path
-from prometheus_api_client import PrometheusConnect
 from datetime import timedelta
 from sklearn.pipeline import Pipeline
 from sklearn.ensemble import GradientBoostingClassifier
 from sklearn.metrics import accuracy_score
+from registry import registry
+from grouped_regression import GroupedLinearRegression
+from features import FeatureStore
+from prom_decode import as_compact_int, as_supi, labels_frame, matrix_frame, parse_times
+from event_store import get_store
+from http_client import prometheus_get, query_range
 
-PROMETHEUS_URL = "http://localhost:9090"
-prom = PrometheusConnect(url=PROMETHEUS_URL, disable_ssl=True)
+# Prometheus (NWDAF_PROMETHEUS_URL) is queried through the shared client in
+# http_client.py: pooled connections, timeouts, retries and a circuit breaker.
+# Read UE_location_report events from the series endpoint (labels only) instead
+# of pulling every series' sample matrix just to look at its labels.
+LOCATION_LABELS_ONLY = os.getenv('NWDAF_LOCATION_LABELS_ONLY', '1') == '1'
+# 'store' reads the events from the local event store (event_store.py, filled
+# by its ingestion daemon) instead of querying Prometheus.
+EVENT_SOURCE = os.getenv('NWDAF_EVENT_SOURCE', 'prometheus')
+
+def get_series(match, start_time, end_time):
+    """ Label sets of the series matching `match` in the window, without sample values. """
+    return prometheus_get('/api/v1/series',
+                          {'match[]': match, 'start': start_time.timestamp(), 'end': end_time.timestamp()})
 
 
 
 
 ###################### Handover prediction ######################
-def get_df_location(start_time=None, end_time=datetime.now()):   #  endtime set on 24th Jan 2025 at 11:30:45
+def get_df_location(start_time=None, end_time=None, labels_only=LOCATION_LABELS_ONLY):   #  endtime set on 24th Jan 2025 at 11:30:45
     # Query Prometheus
-    start_time=end_time - timedelta(days=10)
-    metric_data = prom.custom_query_range(
-        query='UE_location_report',
-        start_time=start_time,
-        end_time=end_time,
-        step='10m'  # 1 minute intervals, adjust as needed
-    )
-    
-    # Process the data into a list of dictionaries
-    records = []
-    for entry in metric_data:
-        metric = entry['metric']
-        # Extract only the desired labels
-        record = {
-            'time': metric['time'],
-            'NrCellId': metric['NrCellId'],
-            'supi': metric['supi'],
-            'tac': metric['tac']
-            
-        }
-        records.append(record)
-    
-    # Convert to DataFrame
-    df = pd.DataFrame(records)
-
-    # Convert time string to datetime
-    # Remove 'UTC' and trailing timezone info for clean parsing
-    df['time'] = df['time'].apply(lambda x: pd.to_datetime(x.split('+')[0].strip()))
+    # Resolve "now" per call: a default argument would freeze it at import time,
+    # which breaks the long-lived worker (main.py --serve).
+    end_time = end_time or datetime.now()
+    start_time = start_time or end_time - timedelta(days=10)
+    if EVENT_SOURCE == 'store':
+        # already decoded, with an indexed lookup on the event time
+        df = get_store().location(start_time, end_time)
+    else:
+        if labels_only:
+            label_sets = get_series('UE_location_report', start_time, end_time)
+        else:
+            metric_data = query_range(
+                query='UE_location_report',
+                start_time=start_time,
+                end_time=end_time,
+                step='10m'  # 1 minute intervals, adjust as needed
+            )
+            label_sets = [entry['metric'] for entry in metric_data]
+
+        # Decode the label columns in bulk: datetime64 times, categorical SUPIs
+        # (without the 'imsi-' prefix) and integer cell / tracking area ids
+        df = labels_frame(label_sets, ['time', 'NrCellId', 'supi', 'tac'])
+        if len(df):
+            df['time'] = parse_times(df['time'])
+            df['supi'] = as_supi(df['supi'])
+            df['NrCellId'] = as_compact_int(df['NrCellId'])
+            df['tac'] = as_compact_int(df['tac'])
+    if df.empty:
+        return pd.DataFrame(columns=['time', 'NrCellId', 'supi', 'tac'])
     # Sort by 'supi' and 'time'
     
     df = df.sort_values(by=['supi', 'time'])
@@ -62,48 +80,24 @@ def get_df_location(start_time=None, end_time=datetime.now()):   #  endtime set
     # Sort by time
     df = df.sort_values('time')
     df['time'] = df['time'] + pd.Timedelta(hours=4)
-    df['supi'] = df['supi'].str.extract(r'imsi-(\d+)').astype(str)
 
     # Reset index after sorting
     df = df.reset_index(drop=True)
     
     return df
 
-def predict_ue_location(target_ue):
-    # Load the dataset
-    df = get_df_location()
-    # Convert the 'time' column to datetime
-    df['time'] = pd.to_datetime(df['time'])
-
-    # Extract the hour from the timestamp
-    df['hour'] = df['time'].dt.hour
-    # df['minute'] = df['time'].dt.minute
-    # Define the time-of-day function
-    def get_time_of_day(hour):
-        if hour >= 7 and hour < 11:
-            return 1#"MORNING"
-        elif hour >= 11 and hour < 14:
-            return 2#"LUNCH"
-        elif hour >= 14 and hour < 17:
-            return 3#"AFTERNOON"
-        elif hour >= 17 and hour < 24:
-            return 4#"EVENING"
-        return 5#"NIGHT"
-    df['time_of_day'] = df['hour'].apply(get_time_of_day)
-    # Mapping of NrCellId to XY coordinates
-    # cell_coords = {30: (5, 170), 40: (5, 5), 50: (170, 5), 60: (170, 170)}
-    df = df.sort_values(by=['supi', 'time']) 
-    # Add columns for the previous two cells (GNBs) each UE was connected to 
-    df['prev_cell_1'] = df.groupby('supi')['NrCellId'].shift(1) 
-    df['prev_cell_2'] = df.groupby('supi')['NrCellId'].shift(2)
-    cell_freq = df.groupby(['supi', 'prev_cell_1','time_of_day']).size().reset_index(name='frequency') 
-    df = pd.merge(df, cell_freq, on=['supi', 'prev_cell_1','time_of_day'], how='left') 
-    # Drop rows where next_cell is missing (last record per subscriber) 
-    df_model = df.dropna(subset=['prev_cell_1','prev_cell_2']).copy()
+LOCATION_FEATURES = ['supi', 'frequency', 'prev_cell_1', 'prev_cell_2', 'time_of_day']
+
+def build_location_features(df):
+    """ Handover features for a standalone frame of location events (e.g. a dataset CSV). """
+    store = FeatureStore(window=None)
+    store.append_location(df)
+    return store.location_features()
+
+def fit_location_model(df_model):
     # Define features and target 
-    features = ['supi', 'frequency', 'prev_cell_1', 'prev_cell_2', 'time_of_day']
     target = 'NrCellId' 
-    X = df_model[features] 
+    X = df_model[LOCATION_FEATURES] 
     y = df_model[target]   
     model = GradientBoostingClassifier(n_estimators=100, max_depth=9, subsample=1.0, learning_rate=0.05, random_state=42)
     # Split the data into training and testing sets (using stratification) 
@@ -111,23 +105,93 @@ def predict_ue_location(target_ue):
     X, y, test_size=0.2, random_state=42)  
     pipeline = Pipeline([('clf', model)]) 
     pipeline.fit(X_train, y_train)    
-    latest = (
-        df_model.loc[df_model['supi'] == target_ue]
-                .sort_values('time')
-                .tail(1)          # newest record
-    )
-
-    if latest.empty or latest[['prev_cell_1', 'prev_cell_2']].isna().any(axis=None):
-        raise ValueError("Need at least two historical cells for this UE.")
+    return pipeline
+
+# Features shared by all requests served by the analytics worker (main.py --serve).
+# Each refresh only pulls the tail of the Prometheus window and appends the new
+# events to the store. A one-shot `python3 main.py` run fills it once and exits.
+# The fitted model itself comes from the registry, so it is only retrained when
+# the features change.
+LOCATION_REFRESH = timedelta(minutes=5)
+FETCH_OVERLAP = timedelta(minutes=15)
+feature_store = FeatureStore()
+_fetched_until = {}
+_location_lock = threading.RLock()
+_location_state = {'fetched_at': None, 'df_model': None, 'pipeline': None}
+# fetch_tail + append of one metric run under its lock, so concurrent requests
+# neither append overlapping tails twice nor skip a window
+_fetch_locks = {'location': _location_lock, 'registration': threading.RLock(), 'active': threading.RLock()}
+
+def fetch_tail(name, fetch):
+    """
+    Call a get_df_* fetcher for the window since its previous call (plus a
+    small overlap). The caller holds _fetch_locks[name] until the result is
+    appended to the feature store.
+    """
+    end_time = datetime.now()
+    last = _fetched_until.get(name)
+    df = fetch(start_time=last - FETCH_OVERLAP if last else None, end_time=end_time)
+    _fetched_until[name] = end_time
+    return df
+
+def get_location_events(refresh=LOCATION_REFRESH):
+    """ Return the stored location events, pulling new ones at most once per `refresh`. """
+    with _location_lock:
+        fetched_at = _location_state['fetched_at']
+        if fetched_at is None or datetime.now() - fetched_at >= refresh:
+            if feature_store.append_location(fetch_tail('location', get_df_location)):
+                _location_state['df_model'] = None
+                _location_state['pipeline'] = None
+            _location_state['fetched_at'] = datetime.now()
+        return feature_store.location
+
+def get_location_model(refresh=LOCATION_REFRESH):
+    """ Return (df_model, pipeline) for the current events; the fit itself comes from the registry. """
+    with _location_lock:
+        get_location_events(refresh)
+        if _location_state['pipeline'] is None:
+            df_model = feature_store.location_features()
+            _location_state['pipeline'] = registry.get('ue_location', df_model, fit_location_model)
+            _location_state['df_model'] = df_model
+        return _location_state['df_model'], _location_state['pipeline']
+
+def predict_ue_location(target_ue):
+    prediction = predict_ue_locations([target_ue])[0]
+    if 'error' in prediction:
+        raise ValueError(prediction['error'])
+    return prediction
+
+def predict_ue_locations(target_ues='all'):
+    """
+    Next-cell prediction for many UEs from one feature build and one
+    predict_proba call. `target_ues` is a list of SUPIs or "all".
+    """
+    df_model, pipeline = get_location_model()
+    # newest record per UE
+    latest = df_model.sort_values('time').groupby('supi').tail(1).set_index('supi', drop=False)
+    if target_ues == 'all':
+        target_ues = sorted(latest.index)
+    known = [ue for ue in target_ues if ue in latest.index]
+    latest = latest.loc[known].copy()
     latest['prev_cell_2'] = latest['prev_cell_1']   # push old lag-1 into lag-2
     latest['prev_cell_1'] = latest['NrCellId']      # current cell becomes lag-1
-    X_new = latest[features] 
-    # Predict the next cell
-    next_cell = pipeline.predict(X_new)[0]
-    return {
-        'predicted_cell': next_cell,
-        'target_ue': target_ue
-    }
+
+    predictions = {}
+    if known:
+        proba = pipeline.predict_proba(latest[LOCATION_FEATURES])
+        classes = pipeline.classes_
+        for ue, row in zip(known, proba):
+            best = row.argmax()
+            predictions[ue] = {
+                'predicted_cell': int(classes[best]),
+                'target_ue': ue,
+                'probability': float(row[best]),
+                'probabilities': {int(cell): float(p) for cell, p in zip(classes, row)},
+            }
+    return [
+        predictions.get(ue, {'target_ue': ue, 'error': "Need at least two historical cells for this UE."})
+        for ue in target_ues
+    ]
 
 
 # def predict_ue_location(target_ue, target_time):
@@ -197,45 +261,33 @@ def predict_ue_location(target_ue):
 
 ###################### registration/deregistration time prediction ######################
 
-def get_df_reg(start_time=None, end_time=datetime.now()):   
-    
-    # Query Prometheus - filter for metrics with SUPI label
-    query = 'amf_ue_registration_state{supi=~".+"}'
-    result = prom.custom_query_range(
-        query=query,
-        start_time=start_time,
-        end_time=end_time,
-        step='5m' # 5 minute intervals, adjust as needed
-    )
-    
-    # Convert to DataFrame
-    dataframes = []
+def get_df_reg(start_time=None, end_time=None):   
+    end_time = end_time or datetime.now()
+    start_time = start_time or end_time - timedelta(days=10)
     
-    if result:
-        for metric in result:
-            # Extract SUPI from metric metadata
-            supi = metric['metric'].get('supi', 'unknown')
-            
-            # Create DataFrame for this SUPI
-            df = pd.DataFrame(metric['values'], columns=['timestamp', 'state'])
-            df['supi'] = supi
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
-            df['state'] = pd.to_numeric(df['state'])
-            
-            # Keep only state changes
-            df = df[df['state'].shift() != df['state']]
-            
-            dataframes.append(df)
-    
-    if dataframes:
-        # Combine all SUPIs into one DataFrame
-        final_df = pd.concat(dataframes, ignore_index=True)
-        
+    if EVENT_SOURCE == 'store':
+        # stored transitions, plus the state each SUPI was in at start_time
+        df = get_store().registration(start_time, end_time)
+    else:
+        # Query Prometheus - filter for metrics with SUPI label
+        query = 'amf_ue_registration_state{supi=~".+"}'
+        result = query_range(
+            query=query,
+            start_time=start_time,
+            end_time=end_time,
+            step='5m' # 5 minute intervals, adjust as needed
+        )
+        df = matrix_frame(result, value_name='state', label='supi')
+    if len(df):
+        df['supi'] = as_supi(df['supi'], strip_prefix=False)
+        df = df.sort_values(['supi', 'sample_time'], kind='stable')
+        # Keep only state changes, per SUPI, in one pass over all series
+        final_df = df[(df['supi'] != df['supi'].shift()) | (df['state'] != df['state'].shift())].copy()
+        final_df['timestamp'] = pd.to_datetime(final_df['sample_time'], unit='s')
+
         # Sort by timestamp
-        final_df = final_df.sort_values('timestamp')
-        
-      
-        
+        final_df = final_df.sort_values('timestamp', kind='stable')
+
         # Add state description
         final_df['state_desc'] = final_df['state'].map({1: 'active', 0: 'inactive'})
         
@@ -257,28 +309,55 @@ def get_df_reg(start_time=None, end_time=datetime.now()):
     else:
         return pd.DataFrame(columns=['timestamp', 'supi', 'state', 'state_desc', 'duration_minutes'])
 
-def predict_duration(supi):
-    data = get_df_reg()
+def fit_duration_models(train_data):
+    # One regression per (supi, state) on the row index, all groups in one pass
+    return GroupedLinearRegression().fit(
+        train_data[['supi', 'state_desc']], train_data['index'], train_data['duration_minutes'])
+
+def get_duration_model():
+    with _fetch_locks['registration']:
+        feature_store.append_registration(fetch_tail('registration', get_df_reg))
+        data = feature_store.registration
     # Drop rows where 'duration_minutes' is NaN for training purposes
     train_data = data.dropna(subset=['duration_minutes']).copy()
     # Use loc to set the index column
     train_data.loc[:, 'index'] = train_data.index
-    grouped = train_data.groupby(['supi', 'state_desc'])
-    models = {}
-    for (supi, state), group in grouped:
-        X = group['index'].values.reshape(-1, 1)  # Using index as the feature
-        y = group['duration_minutes']
-        model = LinearRegression()
-        model.fit(X, y)
-        models[(supi, state)] = model
+    return data, registry.get('reg_duration_grouped', train_data, fit_duration_models)
+
+def _registration_supi(supi):
+    """ A SUPI with or without 'imsi-' as amf_ue_registration_state labels it ('imsi-...') """
+    return 'imsi-' + str(supi).strip().replace('imsi-', '', 1)
+
+def predict_durations(supis='all'):
+    """ Remaining-duration prediction for a list of SUPIs or "all", vectorized over UEs. """
+    data, models = get_duration_model()
+    # Find the most recent entry for each supi
+    last_entries = data.groupby('supi').tail(1)
+    if supis != 'all':
+        last_entries = last_entries[last_entries['supi'].isin([_registration_supi(supi) for supi in supis])]
+    open_entries = last_entries[last_entries['duration_minutes'].isna()]
+    predicted = models.predict(open_entries, open_entries.index)
+    return [
+        {'supi': supi, 'current_state': state, 'predicted_duration': float(duration)}
+        for supi, state, duration in zip(open_entries['supi'], open_entries['state_desc'], predicted)
+        if not np.isnan(duration)
+    ]
+
+def predict_duration(supi):
+    data, models = get_duration_model()
+    supi = _registration_supi(supi)
     # Find the most recent entry for the specified supi
-    last_entry = data[data['supi'] == supi].iloc[-1]
+    history = data[data['supi'] == supi]
+    if history.empty:
+        # the worker answers ValueError with 400, so the caller does not retry through the script
+        raise ValueError(f"No registration history for SUPI {supi}")
+    last_entry = history.iloc[-1]
     if pd.isna(last_entry['duration_minutes']):
         model_key = (supi, last_entry['state_desc'])
         if model_key in models:
             # Predict using the index of the last entry
             index_value = last_entry.name
-            predicted_duration = models[model_key].predict(np.array([[index_value]]))[0]
+            predicted_duration = models.predict(last_entry.to_frame().T, [index_value])[0]
             return {'supi': supi,
                     'current_state': last_entry['state_desc'],
                     'predicted_duration': predicted_duration}
@@ -289,29 +368,28 @@ def predict_duration(supi):
 
 ###################### Active UE count prediction ######################
 
-def get_df_active(start_time=None, end_time=datetime.now()):
+def get_df_active(start_time=None, end_time=None):
+    end_time = end_time or datetime.now()
+    start_time = start_time or end_time - timedelta(days=10)
     
     
-    # Query Prometheus
-    query = 'active_UEs{state="current"}'
-    result = prom.custom_query_range(
-        query=query,
-        start_time=start_time,
-        end_time=end_time,
-        step='5m'  # 30 minute intervals, adjust as needed
-    )
-    
-    # Convert to DataFrame
-    if result and len(result) > 0:
-        # Extract timestamps and values
-        data = result[0]['values']  # values is a list of [timestamp, value] pairs
-        df = pd.DataFrame(data, columns=['timestamp', 'active_UEs'])
-        
-        # Convert timestamp to datetime
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
-        
-        # Convert active_UEs to numeric
-        df['active_UEs'] = pd.to_numeric(df['active_UEs'])
+    if EVENT_SOURCE == 'store':
+        df = get_store().active(start_time, end_time)
+    else:
+        # Query Prometheus
+        query = 'active_UEs{state="current"}'
+        result = query_range(
+            query=query,
+            start_time=start_time,
+            end_time=end_time,
+            step='5m'  # 30 minute intervals, adjust as needed
+        )
+        df = matrix_frame((result or [])[:1], value_name='active_UEs')
+    if len(df):
+        df['timestamp'] = pd.to_datetime(df['sample_time'], unit='s')
+        df = df[['timestamp', 'active_UEs']]
+        # Counts come back as float64; keep them integral like before
+        df['active_UEs'] = pd.to_numeric(df['active_UEs'], downcast='integer')
 
         # Remove duplicate consecutive values
         df = df[df['active_UEs'].shift() != df['active_UEs']]
@@ -325,16 +403,7 @@ def get_df_active(start_time=None, end_time=datetime.now()):
     else:
         return pd.DataFrame(columns=['timestamp', 'active_UEs'])
 
-def predict_ActiveUE_count():
-    data = get_df_active()
-    data['timestamp'] = pd.to_datetime(data['timestamp'])
-    data['duration'] = pd.to_timedelta(data['duration'])
-
-    # Feature engineering
-    data['hour_of_day'] = data['timestamp'].dt.hour
-    data['minute_of_hour'] = data['timestamp'].dt.minute
-    data['day_of_week'] = data['timestamp'].dt.dayofweek
-
+def fit_active_ue_models(data):
     # Prepare target variables
     duration_seconds = data['duration'].dt.total_seconds()
     label_encoder = LabelEncoder()
@@ -355,6 +424,17 @@ def predict_ActiveUE_count():
     # Train the models
     model_duration.fit(X_train, y_duration_train)
     model_active_ues.fit(X_train, y_active_ues_train)
+    return label_encoder, model_duration, model_active_ues
+
+def get_active_changes():
+    with _fetch_locks['active']:
+        feature_store.append_active(fetch_tail('active', get_df_active))
+        return feature_store.active
+
+def predict_ActiveUE_count():
+    data = get_active_changes()
+
+    label_encoder, model_duration, model_active_ues = registry.get('active_ue_count', data, fit_active_ue_models)
 
     # Predicting the next entry
     next_timestamp_features = pd.DataFrame({
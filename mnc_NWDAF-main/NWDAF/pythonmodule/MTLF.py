@@ -1,9 +1,14 @@
-from Model import *
 import os.path
 
-def MTLF(model):
+def MTLF(model=None):
+    # TensorFlow and MNIST are only loaded when training is actually requested,
+    # so importing this module stays cheap for the analytics entry points.
+    from Model import load_model, x_train, y_train
+    if model is None:
+        from Model import model
     if os.path.isfile('model.h5'):
         model = load_model('model.h5')
     model.fit(x_train, y_train, epochs=1)
     model.save('model.h5')
     print("trainig finish")
+    return "training finish"
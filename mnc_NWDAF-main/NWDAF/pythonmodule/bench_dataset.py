@@ -0,0 +1,78 @@
+# bench_dataset.py
+#
+# pd.read_csv over the exported `core dataset` CSVs vs core_dataset.load on
+# the Parquet copy, for the reads the notebooks and training scripts do:
+#   full        every row and column, typed
+#   projection  two columns
+#   pushdown    one week of one SUPI
+# The CSV side parses the same files and applies the same filters in pandas.
+#
+#   python3 core_dataset.py convert
+#   python3 bench_dataset.py [--repeat 5] [--start 2025-03-01 --days 7 --supi 208930000000002]
+
+import argparse
+import statistics
+import time
+
+import pandas as pd
+
+import core_dataset
+from core_dataset import TABLES, load, sources
+
+PROJECTION = {
+    'location': ['time', 'NrCellId'],
+    'destination': ['time', 'location_type'],
+    'loc_des': ['time', 'NrCellId'],
+    'registration': ['timestamp', 'state_desc'],
+    'active': ['timestamp', 'active_UEs'],
+}
+
+
+def read_csv(table, columns=None, start=None, end=None, supi=None):
+    """ What the scripts do today: parse every file, then filter in pandas. """
+    time_column = TABLES[table][1]
+    usecols = None if columns is None else sorted(set(columns) | {time_column} | ({'supi'} if supi else set()))
+    df = pd.concat([pd.read_csv(path, usecols=usecols, parse_dates=[time_column])
+                    for _, path in sources()[table]], ignore_index=True)
+    if start is not None:
+        df = df[(df[time_column] >= start) & (df[time_column] < end)]
+    if supi is not None:
+        df = df[df['supi'].astype(str).str.endswith(supi)]
+    return df if columns is None else df[columns]
+
+
+def timed(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(fn())
+        runs.append(time.perf_counter() - start)
+    return statistics.median(runs), rows
+
+
+def bench(repeat, start, end, supi):
+    print(f"{'table':<13} {'read':<11} {'csv [ms]':>9} {'parquet [ms]':>13} {'speedup':>8} {'rows':>7}")
+    for table in TABLES:
+        cases = {
+            'full': {},
+            'projection': {'columns': PROJECTION[table]},
+            'pushdown': {'start': start, 'end': end, **({'supi': supi} if TABLES[table][2] is not None else {})},
+        }
+        for name, kwargs in cases.items():
+            csv_time, csv_rows = timed(lambda: read_csv(table, **kwargs), repeat)
+            parquet_time, parquet_rows = timed(lambda: load(table, **kwargs), repeat)
+            mismatch = '' if csv_rows == parquet_rows else f"  (csv {csv_rows} rows)"
+            print(f"{table:<13} {name:<11} {csv_time * 1e3:>9.1f} {parquet_time * 1e3:>13.1f} "
+                  f"{csv_time / parquet_time:>7.1f}x {parquet_rows:>7}{mismatch}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the Parquet loader against pd.read_csv.")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--start', default='2025-03-01')
+    parser.add_argument('--days', type=float, default=7)
+    parser.add_argument('--supi', default='208930000000002')
+    args = parser.parse_args()
+    start = pd.Timestamp(args.start)
+    print(f"Parquet copy: {core_dataset.PARQUET_DIR}")
+    bench(args.repeat, start, start + pd.Timedelta(days=args.days), args.supi)
@@ -0,0 +1,65 @@
+# bench_startup.py
+#
+# Cold-start cost per analytics type: every sample is a fresh interpreter that
+# imports main.py and loads one backend, which is what the Go producer pays
+# when it spawns the script. Top imports come from `python -X importtime`.
+#
+#   python3 bench_startup.py [--repeat 5] [--top 5] [analyticsId ...]
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from main import ANALYTICS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_once(analytics_id, importtime=False):
+    code = "import main" if analytics_id is None else f"import main; main.load_analytics({analytics_id!r})"
+    cmd = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', code]
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=HERE, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    return elapsed, proc.stderr
+
+
+def top_imports(importtime_log, n):
+    # Lines look like: "import time:   self [us] | cumulative | imported package"
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith(' ' * 2):    # top-level imports only
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure pythonmodule import cost per analytics type.")
+    parser.add_argument('analytics', nargs='*', default=list(ANALYTICS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'analyticsId':<18} {'median [s]':>10} {'min [s]':>8}  top imports (cumulative)")
+    for analytics_id in [None] + args.analytics:
+        label = analytics_id or '(main only)'
+        try:
+            times = [run_once(analytics_id)[0] for _ in range(args.repeat)]
+            _, log = run_once(analytics_id, importtime=True)
+        except RuntimeError as e:
+            print(f"{label:<18} failed: {e}")
+            continue
+        top = ', '.join(f"{name} {us / 1e6:.2f}s" for us, name in top_imports(log, args.top))
+        print(f"{label:<18} {statistics.median(times):>10.3f} {min(times):>8.3f}  {top}")
+
+
+if __name__ == '__main__':
+    main()
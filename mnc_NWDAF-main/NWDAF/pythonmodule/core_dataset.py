@@ -0,0 +1,211 @@
+# core_dataset.py
+#
+# Typed, date-partitioned Parquet copy of the exported `core dataset` CSVs
+# (the period folders and the df_NNNN.csv location traces), and a loader
+# that reads it back with column projection and date / SUPI pushdown.
+#
+#   python3 core_dataset.py convert               # (re)build core dataset/parquet
+#   python3 core_dataset.py info                  # rows / files / bytes per table
+#
+#   from core_dataset import load
+#   load('location', columns=['time', 'NrCellId'], start='2025-03-01', end='2025-03-08',
+#        supi='208930000000002')
+#
+# Layout: <parquet>/<table>/month=YYYY-MM/part-N.parquet, rows sorted by
+# time inside each file. A period holds ~50 rows per table and day, so
+# daily files would cost more in footers and opens than they save; the
+# month prunes partitions and the time statistics of each row group prune
+# inside them. Every row carries the folder or trace it came from
+# in `source`; the df_NNNN traces and the periods overlap, so pass source=
+# when a single copy of each event is needed.
+#
+# Until `convert` has been run, load() reads the same rows straight from the
+# CSVs (slower, no pushdown), so scripts work on a fresh checkout.
+#
+# Column types follow prom_decode: NrCellId / tac int32, times datetime64,
+# SUPI and the other labels categorical. SUPIs keep the form of the CSV
+# (digits, 'imsi-' for registration); `supi=` filters accept either form.
+
+import argparse
+import glob
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from prom_decode import as_compact_int
+
+DATASET_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'core dataset'))
+PARQUET_DIR = os.getenv('NWDAF_PARQUET_DIR', os.path.join(DATASET_DIR, 'parquet'))
+
+# table -> (CSV file name inside a period folder, time column, SUPI prefix)
+TABLES = {
+    'location': ('df_location.csv', 'time', ''),
+    'destination': ('df_destination.csv', 'time', ''),
+    'loc_des': ('df_loc_des.csv', 'time', ''),
+    'registration': ('df_reg.csv', 'timestamp', 'imsi-'),
+    'active': ('df_active.csv', 'timestamp', None),
+}
+CATEGORICAL = ('supi', 'location_type', 'time_of_day', 'state_desc')
+TRACE_PATTERN = 'df_[0-9]*.csv'     # location-only traces next to the period folders
+PARTITION_FORMAT = '%Y-%m'          # one directory per month
+PARTITIONING = ds.partitioning(pa.schema([('month', pa.string())]), flavor='hive')
+
+
+def _typed(table, df):
+    """ CSV text columns -> the types used by the analytics code. """
+    time_column = TABLES[table][1]
+    df[time_column] = pd.to_datetime(df[time_column], format='ISO8601')
+    for column in ('NrCellId', 'tac'):
+        if column in df:
+            df[column] = as_compact_int(df[column])
+    for column in CATEGORICAL:
+        if column in df:
+            df[column] = df[column].astype('category')
+    if 'duration' in df:
+        df['duration'] = pd.to_timedelta(df['duration']) if table == 'active' \
+            else pd.to_numeric(df['duration']).astype('int32')
+    if 'duration_minutes' in df:
+        df['duration_minutes'] = pd.to_numeric(df['duration_minutes'])
+    if 'active_UEs' in df:
+        df['active_UEs'] = pd.to_numeric(df['active_UEs']).astype('int16')
+    return df
+
+
+def sources(dataset_dir=DATASET_DIR):
+    """ table -> [(source name, csv path)] for every CSV the converter picks up. """
+    found = {table: [] for table in TABLES}
+    for folder in sorted(p for p in glob.glob(os.path.join(dataset_dir, '*')) if os.path.isdir(p)):
+        for table, (name, _, _) in TABLES.items():
+            if os.path.exists(os.path.join(folder, name)):
+                found[table].append((os.path.basename(folder), os.path.join(folder, name)))
+    for path in sorted(glob.glob(os.path.join(dataset_dir, TRACE_PATTERN))):
+        found['location'].append((os.path.splitext(os.path.basename(path))[0], path))
+    return found
+
+
+def _read_csvs(table, paths):
+    """ Typed rows of [(source name, csv path)], sorted by time. """
+    frames = [_typed(table, pd.read_csv(path, dtype=str)).assign(source=name) for name, path in paths]
+    df = pd.concat(frames, ignore_index=True)
+    for column in CATEGORICAL + ('source',):
+        # categories differ between sources, so concat falls back to object
+        if column in df:
+            df[column] = df[column].astype('category')
+    return df.sort_values([TABLES[table][1], 'source'], kind='stable')
+
+
+def convert(dataset_dir=DATASET_DIR, out=PARQUET_DIR):
+    """ Rewrite every table from the CSVs; returns table -> row count. """
+    counts = {}
+    for table, paths in sources(dataset_dir).items():
+        if not paths:
+            continue
+        df = _read_csvs(table, paths)
+        time_column = TABLES[table][1]
+        df['month'] = df[time_column].dt.strftime(PARTITION_FORMAT)
+        target = os.path.join(out, table)
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        ds.write_dataset(pa.Table.from_pandas(df, preserve_index=False), target, format='parquet',
+                         partitioning=PARTITIONING, existing_data_behavior='overwrite_or_ignore')
+        counts[table] = len(df)
+    return counts
+
+
+def _values(value):
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _supi_values(supis, prefix):
+    digits = [str(s).replace('imsi-', '', 1) for s in _values(supis)]
+    return [prefix + s for s in digits]
+
+
+def _dataset(table, root):
+    path = os.path.join(root, table)
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"no Parquet data for {table!r} under {root}; run 'python3 core_dataset.py convert'")
+    return ds.dataset(path, format='parquet', partitioning=PARTITIONING)
+
+
+def _load_csv(table, columns, start, end, supi, source, dataset_dir):
+    """ load() from the CSVs themselves, for when the Parquet copy is missing. """
+    _, time_column, prefix = TABLES[table]
+    paths = [(name, path) for name, path in sources(dataset_dir)[table] if source is None or name in _values(source)]
+    if not paths:
+        raise FileNotFoundError(f"no {table!r} CSVs under {dataset_dir}" + (f" for source {source!r}" if source else ''))
+    df = _read_csvs(table, paths)
+    keep = pd.Series(True, index=df.index)
+    if start is not None:
+        keep &= df[time_column] >= pd.Timestamp(start)
+    if end is not None:
+        keep &= df[time_column] < pd.Timestamp(end)
+    if supi is not None:
+        keep &= df['supi'].isin(_supi_values(supi, prefix))
+    return df.loc[keep, columns or list(df.columns)].reset_index(drop=True)
+
+
+def load(table, columns=None, start=None, end=None, supi=None, source=None, root=PARQUET_DIR,
+         dataset_dir=DATASET_DIR):
+    """
+    One table as a typed DataFrame. `columns` projects (only those are read),
+    start <= time < end prunes whole month partitions before filtering rows,
+    and `supi` / `source` (one value or a list) are pushed into the scan so
+    row groups without a match are skipped. Without a Parquet copy under
+    `root` the rows come from the CSVs under `dataset_dir`.
+    """
+    _, time_column, prefix = TABLES[table]
+    if supi is not None and prefix is None:
+        raise ValueError(f"{table!r} has no supi column")
+    if not os.path.isdir(os.path.join(root, table)):
+        return _load_csv(table, columns, start, end, supi, source, dataset_dir)
+    dataset = _dataset(table, root)
+    condition = None
+
+    def add(expr):
+        nonlocal condition
+        condition = expr if condition is None else condition & expr
+
+    if start is not None:
+        start = pd.Timestamp(start)
+        add(ds.field('month') >= start.strftime(PARTITION_FORMAT))
+        add(ds.field(time_column) >= pa.scalar(start.value, pa.timestamp('ns')))
+    if end is not None:
+        end = pd.Timestamp(end)
+        add(ds.field('month') <= end.strftime(PARTITION_FORMAT))
+        add(ds.field(time_column) < pa.scalar(end.value, pa.timestamp('ns')))
+    if supi is not None:
+        add(pc.is_in(ds.field('supi'), pa.array(_supi_values(supi, prefix))))
+    if source is not None:
+        add(pc.is_in(ds.field('source'), pa.array(_values(source))))
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name != 'month']
+    return dataset.to_table(columns=columns, filter=condition).to_pandas().reset_index(drop=True)
+
+
+def info(root=PARQUET_DIR):
+    """ table -> (rows, files, bytes) of the converted copy. """
+    summary = {}
+    for table in TABLES:
+        path = os.path.join(root, table)
+        if os.path.isdir(path):
+            files = _dataset(table, root).files
+            summary[table] = (_dataset(table, root).count_rows(), len(files), sum(os.path.getsize(f) for f in files))
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Parquet copy of the core dataset CSVs.")
+    parser.add_argument('command', choices=['convert', 'info'])
+    parser.add_argument('--dataset', default=DATASET_DIR)
+    parser.add_argument('--out', default=PARQUET_DIR)
+    args = parser.parse_args()
+    if args.command == 'convert':
+        for table, rows in convert(args.dataset, args.out).items():
+            print(f"{table:<13} {rows:>8} rows")
+    for table, (rows, files, size) in info(args.out).items():
+        print(f"{table:<13} {rows:>8} rows {files:>4} files {size:>10,} bytes")
@@ -0,0 +1,315 @@
+# event_store.py
+#
+# On-disk event store (SQLite) for the four NWDAF metrics, filled by an
+# ingestion daemon that tails Prometheus incrementally. History survives
+# Prometheus' retention, and AnLF.py / prom_query.py can read it with indexed
+# time and SUPI lookups instead of re-querying Prometheus on every request
+# (NWDAF_EVENT_SOURCE=store / PROM_EVENT_SOURCE=store).
+#
+#   python3 event_store.py               # ingest every 60 s
+#   python3 event_store.py --once        # a single ingestion pass
+#
+# Tables; times are UTC epoch nanoseconds and SUPIs are stored without 'imsi-':
+#   location      time_ns, supi, NrCellId, tac                            one row per UE_location_report event
+#   destination   time_ns, supi, location_type, duration, time_of_day     one row per ue_destination_visits_total event
+#   registration  time_ns, supi, state                                    amf_ue_registration_state transitions
+#   active        time_ns, active_UEs                                     active_UEs{state="current"} changes
+#   ingest_state  metric, until_ns                                        how far each metric has been ingested
+# plus the 5m / 1h / 1d rollups of active and registration (rollups.py), refreshed after every pass.
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import requests
+
+from http_client import ENDPOINTS, prometheus_get
+from prom_decode import as_compact_int, as_supi, labels_frame, matrix_frame, parse_times
+from rollups import Rollups
+
+PROMETHEUS_URL = ENDPOINTS['prometheus']['url']
+DB_PATH = os.getenv('NWDAF_EVENT_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'events.db'))
+INGEST_INTERVAL = 60                      # seconds between daemon passes
+INITIAL_LOOKBACK = timedelta(days=10)     # history pulled on the first pass
+OVERLAP = timedelta(minutes=15)           # re-read this much of the last window for late samples
+STEP = 300                                # query_range step in seconds (5m, like the analytics)
+MAX_POINTS = 10000                        # stay below Prometheus' 11,000 points per series
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS location (
+    time_ns INTEGER NOT NULL, supi TEXT NOT NULL, NrCellId INTEGER NOT NULL, tac INTEGER,
+    PRIMARY KEY (supi, time_ns, NrCellId)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS location_time ON location (time_ns);
+CREATE INDEX IF NOT EXISTS location_cell ON location (NrCellId, time_ns);
+
+CREATE TABLE IF NOT EXISTS destination (
+    time_ns INTEGER NOT NULL, supi TEXT NOT NULL, location_type TEXT NOT NULL, duration REAL, time_of_day TEXT,
+    PRIMARY KEY (supi, time_ns, location_type)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS destination_time ON destination (time_ns);
+
+CREATE TABLE IF NOT EXISTS registration (
+    time_ns INTEGER NOT NULL, supi TEXT NOT NULL, state INTEGER NOT NULL,
+    PRIMARY KEY (supi, time_ns)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS registration_time ON registration (time_ns);
+
+CREATE TABLE IF NOT EXISTS active (
+    time_ns INTEGER PRIMARY KEY, active_UEs INTEGER NOT NULL);
+
+CREATE TABLE IF NOT EXISTS ingest_state (
+    metric TEXT PRIMARY KEY, until_ns INTEGER NOT NULL);
+"""
+
+
+def _ns(t):
+    """ datetime (naive = local time, like datetime.now()) or epoch seconds -> epoch nanoseconds """
+    return int(round((t.timestamp() if isinstance(t, datetime) else float(t)) * 1e9))
+
+
+def _time_ns(times):
+    return times.values.astype('datetime64[ns]').astype('int64')
+
+
+def _supis(supi):
+    """ One SUPI or a list, with or without 'imsi-' -> list of stored SUPIs """
+    return [str(s).replace('imsi-', '', 1) for s in (supi if isinstance(supi, (list, tuple)) else [supi])]
+
+
+class EventStore:
+
+    def __init__(self, path=DB_PATH, url=PROMETHEUS_URL):
+        self.path = path
+        self.url = url
+        self._lock = threading.Lock()
+        with self._db() as db:
+            db.execute('PRAGMA journal_mode=WAL')   # readers do not block the ingestion daemon
+            db.executescript(SCHEMA)
+        self.rollups = Rollups(self)
+
+    @contextmanager
+    def _db(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    ###################### Prometheus ######################
+
+    def _get(self, path, params):
+        # long backfills return big matrices, so allow a longer read than interactive queries
+        return prometheus_get(path, params, url=self.url, timeout=(3.05, 120))
+
+    def _series(self, match, start, end):
+        return self._get('/api/v1/series', {'match[]': match, 'start': start, 'end': end})
+
+    def _range(self, query, start, end):
+        result = []
+        # step-aligned, so the samples land on the same grid as the analytics' queries
+        for chunk_start in np.arange(start - start % STEP, end, STEP * MAX_POINTS):
+            chunk_end = min(chunk_start + STEP * MAX_POINTS, end)
+            result += self._get('/api/v1/query_range',
+                                {'query': query, 'start': chunk_start, 'end': chunk_end, 'step': STEP})['result']
+        return result
+
+    ###################### Ingestion ######################
+
+    def _ingest_location(self, db, start, end):
+        df = labels_frame(self._series('UE_location_report', start, end), ['time', 'NrCellId', 'supi', 'tac'])
+        if df.empty:
+            return 0
+        rows = zip(_time_ns(parse_times(df['time'])).tolist(), as_supi(df['supi']).astype(str),
+                   as_compact_int(df['NrCellId']).tolist(), as_compact_int(df['tac']).tolist())
+        return db.executemany('INSERT OR IGNORE INTO location VALUES (?, ?, ?, ?)', rows).rowcount
+
+    def _ingest_destination(self, db, start, end):
+        df = labels_frame(self._series('ue_destination_visits_total', start, end),
+                          ['timestamp', 'supi', 'location_type', 'duration', 'time_of_day'])
+        if df.empty:
+            return 0
+        rows = zip(_time_ns(parse_times(df['timestamp'])).tolist(), as_supi(df['supi']).astype(str),
+                   df['location_type'], pd.to_numeric(df['duration'], errors='coerce').tolist(), df['time_of_day'])
+        return db.executemany('INSERT OR IGNORE INTO destination VALUES (?, ?, ?, ?, ?)', rows).rowcount
+
+    @staticmethod
+    def _changes(samples, last, key=None):
+        """
+        Rows of `samples` (sorted by time) whose value differs from the one
+        before, continuing from the last stored value(s) in `last`.
+        """
+        if key is None:
+            previous = samples['value'].shift(fill_value=last['value'].iloc[0] if len(last) else np.nan)
+            newer = samples['time_ns'] > (last['time_ns'].iloc[0] if len(last) else -1)
+            return samples[newer & (samples['value'] != previous)]
+        stored = last.set_index(key)
+        samples = samples[samples['time_ns'].values > samples[key].map(stored['time_ns']).fillna(-1).values]
+        previous = samples.groupby(key, sort=False)['value'].shift()
+        first = previous.isna()
+        previous[first] = samples.loc[first, key].map(stored['value'])
+        return samples[samples['value'] != previous]
+
+    def _ingest_registration(self, db, start, end):
+        df = matrix_frame(self._range('amf_ue_registration_state{supi=~".+"}', start, end), 'value', label='supi')
+        if df.empty:
+            return 0
+        df['supi'] = as_supi(df['supi']).astype(str)
+        df['time_ns'] = np.round(df['sample_time'].values * 1e9).astype('int64')
+        df = df.sort_values(['supi', 'time_ns'], kind='stable')
+        last = pd.read_sql_query('SELECT supi, MAX(time_ns) AS time_ns, state AS value FROM registration GROUP BY supi', db)
+        changes = self._changes(df, last, key='supi')
+        rows = zip(changes['time_ns'].tolist(), changes['supi'], changes['value'].astype(int).tolist())
+        return db.executemany('INSERT OR IGNORE INTO registration VALUES (?, ?, ?)', rows).rowcount
+
+    def _ingest_active(self, db, start, end):
+        # a single series, possibly split over several query_range chunks
+        df = matrix_frame(self._range('active_UEs{state="current"}', start, end), 'value')
+        if df.empty:
+            return 0
+        df['time_ns'] = np.round(df['sample_time'].values * 1e9).astype('int64')
+        last = pd.read_sql_query('SELECT time_ns, active_UEs AS value FROM active ORDER BY time_ns DESC LIMIT 1', db)
+        changes = self._changes(df.sort_values('time_ns'), last)
+        rows = zip(changes['time_ns'].tolist(), changes['value'].astype(int).tolist())
+        return db.executemany('INSERT OR IGNORE INTO active VALUES (?, ?)', rows).rowcount
+
+    INGESTERS = {
+        'UE_location_report': _ingest_location,
+        'ue_destination_visits_total': _ingest_destination,
+        'amf_ue_registration_state': _ingest_registration,
+        'active_UEs': _ingest_active,
+    }
+
+    def ingest(self, now=None):
+        """ Pull what each metric gained since the last pass; returns the number of new rows per metric. """
+        end = _ns(now or datetime.now()) / 1e9
+        added = {}
+        with self._lock:
+            with self._db() as db:
+                state = dict(db.execute('SELECT metric, until_ns FROM ingest_state').fetchall())
+                for metric, ingest in self.INGESTERS.items():
+                    start = state[metric] / 1e9 - OVERLAP.total_seconds() if metric in state \
+                        else end - INITIAL_LOOKBACK.total_seconds()
+                    added[metric] = ingest(self, db, start, end)
+                    db.execute('INSERT OR REPLACE INTO ingest_state VALUES (?, ?)', (metric, int(end * 1e9)))
+            # after the commit, so the rollups see this pass' transitions
+            self.rollups.update()
+        return added
+
+    def run(self, interval=INGEST_INTERVAL):
+        while True:
+            started = time.monotonic()
+            try:
+                added = self.ingest()
+                print(datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'ingested', added, flush=True)
+            except (requests.RequestException, RuntimeError) as e:
+                print("Ingestion failed:", e, flush=True)
+            time.sleep(max(interval - (time.monotonic() - started), 0))
+
+    ###################### Reading ######################
+
+    def _query(self, sql, params):
+        with self._db() as db:
+            return pd.read_sql_query(sql, db, params=params)
+
+    @staticmethod
+    def _where(start_time, end_time, supi=None, extra=()):
+        clauses, params = [], []
+        if start_time is not None:
+            clauses.append('time_ns >= ?')
+            params.append(_ns(start_time))
+        if end_time is not None:
+            clauses.append('time_ns <= ?')
+            params.append(_ns(end_time))
+        if supi:
+            supis = _supis(supi)
+            clauses.append(f"supi IN ({','.join('?' * len(supis))})")
+            params += supis
+        for clause, values in extra:
+            clauses.append(clause)
+            params += values
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def location(self, start_time=None, end_time=None, supi=None, cell=None):
+        """ UE_location_report events as decoded labels: time (UTC), NrCellId, supi, tac """
+        extra = []
+        if cell is not None:
+            cells = [int(c) for c in (cell if isinstance(cell, (list, tuple)) else [cell])]
+            extra.append((f"NrCellId IN ({','.join('?' * len(cells))})", cells))
+        where, params = self._where(start_time, end_time, supi, extra)
+        df = self._query(f'SELECT time_ns, NrCellId, supi, tac FROM location{where} ORDER BY time_ns', params)
+        return pd.DataFrame({'time': pd.to_datetime(df['time_ns'], unit='ns'),
+                             'NrCellId': df['NrCellId'].astype('int32'), 'supi': as_supi(df['supi']),
+                             'tac': df['tac'].astype('int32')})
+
+    def destination(self, start_time=None, end_time=None, supi=None):
+        """ ue_destination_visits_total events: time, supi, location_type, duration, time_of_day """
+        where, params = self._where(start_time, end_time, supi)
+        df = self._query('SELECT time_ns, supi, location_type, duration, time_of_day '
+                         f'FROM destination{where} ORDER BY time_ns', params)
+        df.insert(0, 'time', pd.to_datetime(df.pop('time_ns'), unit='ns'))
+        df['supi'] = as_supi(df['supi'])
+        return df
+
+    def _transitions(self, table, value, start_time, end_time, supi=None):
+        """
+        Transitions in the window plus, per series, the last one before it
+        (moved to the window start), so the state at the start is known --
+        the same samples a range query over the window would return.
+        """
+        where, params = self._where(start_time, end_time, supi)
+        key = ', supi' if table == 'registration' else ''
+        sql = f'SELECT time_ns, {value}{key} FROM {table}{where}'
+        if start_time is not None:
+            before, before_params = self._where(None, None, supi, [('time_ns < ?', [_ns(start_time)])])
+            group = ' GROUP BY supi' if key else ''
+            sql = f'SELECT MAX(time_ns) AS time_ns, {value}{key} FROM {table}{before}{group} UNION ALL ' + sql
+            params = before_params + params
+        df = self._query(sql, params).dropna(subset=['time_ns'])
+        if start_time is not None:
+            df['time_ns'] = df['time_ns'].clip(lower=_ns(start_time))
+        df['sample_time'] = df.pop('time_ns').astype('int64') / 1e9
+        return df.sort_values('sample_time', kind='stable').reset_index(drop=True)
+
+    def registration(self, start_time=None, end_time=None, supi=None):
+        """ Registration transitions like matrix_frame(..., 'state', 'supi'): sample_time, state, supi ('imsi-...') """
+        df = self._transitions('registration', 'state', start_time, end_time, supi)
+        df['state'] = df['state'].astype(float)
+        df['supi'] = ('imsi-' + df['supi'].astype(str)).astype('category')
+        return df[['sample_time', 'state', 'supi']]
+
+    def active(self, start_time=None, end_time=None):
+        """ active_UEs changes like matrix_frame(..., 'active_UEs'): sample_time, active_UEs """
+        df = self._transitions('active', 'active_UEs', start_time, end_time)
+        df['active_UEs'] = df['active_UEs'].astype(float)
+        return df[['sample_time', 'active_UEs']]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """ Process-wide store on NWDAF_EVENT_DB """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = EventStore()
+        return _store
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Tail the NWDAF metrics from Prometheus into the event store.")
+    parser.add_argument('--once', action='store_true', help="run a single ingestion pass and exit")
+    parser.add_argument('--interval', type=float, default=INGEST_INTERVAL, help="seconds between passes")
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--url', default=PROMETHEUS_URL)
+    args = parser.parse_args()
+    store = EventStore(args.db, args.url)
+    if args.once:
+        print(store.ingest())
+    else:
+        store.run(args.interval)
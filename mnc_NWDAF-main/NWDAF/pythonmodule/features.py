@@ -0,0 +1,187 @@
+# features.py
+#
+# Incremental feature store shared by the AnLF predictors. Handover lags and
+# cell frequencies, registration durations and active-UE calendar features
+# are computed vectorized when events are appended; only events newer than
+# what is already stored are processed, and every predictor reads the same
+# materialized frames.
+
+import threading
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+
+# Define the time-of-day function
+def get_time_of_day(hour):
+    if hour >= 7 and hour < 11:
+        return 1#"MORNING"
+    elif hour >= 11 and hour < 14:
+        return 2#"LUNCH"
+    elif hour >= 14 and hour < 17:
+        return 3#"AFTERNOON"
+    elif hour >= 17 and hour < 24:
+        return 4#"EVENING"
+    return 5#"NIGHT"
+
+# Lookup table so whole columns are bucketed with one indexing operation
+TIME_OF_DAY_BY_HOUR = np.array([get_time_of_day(hour) for hour in range(24)])
+
+def time_of_day(times):
+    return TIME_OF_DAY_BY_HOUR[times.dt.hour.values]
+
+LOCATION_COLUMNS = ['time', 'NrCellId', 'supi', 'tac']
+REGISTRATION_COLUMNS = ['timestamp', 'supi', 'state_desc', 'duration_minutes']
+ACTIVE_COLUMNS = ['timestamp', 'active_UEs', 'duration']
+FREQUENCY_KEYS = ['supi', 'prev_cell_1', 'time_of_day']
+
+
+def _newer_than_stored(new, stored, time_col, key=None):
+    """ Rows of `new` later than the newest stored row (per `key` when given). """
+    if stored.empty:
+        return new
+    if key is None:
+        return new[new[time_col] > stored[time_col].max()]
+    last = new[key].map(stored.groupby(key, observed=True)[time_col].max())
+    return new[last.isna() | (new[time_col] > pd.to_datetime(last))]
+
+
+class FeatureStore:
+    """
+    Materialized features over a sliding `window` (None keeps everything).
+
+      location      time, NrCellId, supi, tac, hour, time_of_day, prev_cell_1, prev_cell_2
+      cell_freq     count per (supi, prev_cell_1, time_of_day), kept in step with `location`
+      registration  timestamp, supi, state_desc, duration_minutes; the index is the
+                    global row number used as the regression feature by predict_duration
+      active        timestamp, active_UEs, duration, hour_of_day, minute_of_hour, day_of_week
+    """
+
+    def __init__(self, window=timedelta(days=10)):
+        self.window = window
+        self.location = pd.DataFrame(columns=LOCATION_COLUMNS + ['hour', 'time_of_day', 'prev_cell_1', 'prev_cell_2'])
+        self.cell_freq = pd.Series(dtype='int64')
+        self.registration = pd.DataFrame(columns=REGISTRATION_COLUMNS)
+        self.active = pd.DataFrame(columns=ACTIVE_COLUMNS + ['hour_of_day', 'minute_of_hour', 'day_of_week'])
+        self._lock = threading.RLock()
+
+    ###################### Handover ######################
+
+    def append_location(self, events):
+        """ Add UE_location_report events (time, NrCellId, supi, tac); returns the number of new handovers. """
+        with self._lock:
+            events = events[LOCATION_COLUMNS].copy()
+            events['time'] = pd.to_datetime(events['time'])
+            new = _newer_than_stored(events, self.location, 'time', key='supi')
+            if new.empty:
+                return 0
+            # Lags of the first new events per UE come from the last two stored ones.
+            tail = self.location.sort_values('time').groupby('supi').tail(2)[LOCATION_COLUMNS]
+            # (concatenating with an empty frame would turn the typed columns into objects)
+            combined = pd.concat([tail.assign(_new=False), new.assign(_new=True)], ignore_index=True) \
+                if len(tail) else new.assign(_new=True).reset_index(drop=True)
+            combined['time'] = pd.to_datetime(combined['time'])
+            combined = combined.sort_values(['supi', 'time'], kind='stable')
+            # Drop consecutive rows with the same 'supi' and 'NrCellId'
+            combined = combined.loc[
+                ~(combined['supi'] == combined['supi'].shift()) |
+                ~(combined['NrCellId'] == combined['NrCellId'].shift())
+            ]
+            by_supi = combined.groupby('supi')['NrCellId']
+            combined['prev_cell_1'] = by_supi.shift(1)
+            combined['prev_cell_2'] = by_supi.shift(2)
+            added = combined[combined['_new']].drop(columns='_new')
+            added['hour'] = added['time'].dt.hour
+            added['time_of_day'] = time_of_day(added['time'])
+
+            self._count_frequency(added, +1)
+            self.location = pd.concat([self.location, added], ignore_index=True) if len(self.location) else added.reset_index(drop=True)
+            self._trim_location()
+            return len(added)
+
+    def _count_frequency(self, rows, sign):
+        counts = rows.groupby(FREQUENCY_KEYS, observed=True).size() * sign
+        if self.cell_freq.empty:
+            self.cell_freq = counts
+        else:
+            self.cell_freq = self.cell_freq.add(counts, fill_value=0).astype('int64')
+        self.cell_freq = self.cell_freq[self.cell_freq > 0]
+
+    def _trim_location(self):
+        if self.window is None or self.location.empty:
+            return
+        old = self.location['time'] < self.location['time'].max() - self.window
+        if old.any():
+            self._count_frequency(self.location[old], -1)
+            self.location = self.location[~old].reset_index(drop=True)
+
+    def location_features(self):
+        """ Rows with two known previous cells plus their `frequency`, as the handover model expects. """
+        with self._lock:
+            df = self.location.dropna(subset=['prev_cell_1', 'prev_cell_2']).copy()
+            keys = pd.MultiIndex.from_frame(df[FREQUENCY_KEYS])
+            df['frequency'] = self.cell_freq.reindex(keys).fillna(0).astype('int64').values
+            return df.sort_values(['supi', 'time']).reset_index(drop=True)
+
+    ###################### Registration ######################
+
+    def append_registration(self, reg):
+        """ Add registration state changes (timestamp, supi, state_desc); durations of open rows are filled in. """
+        with self._lock:
+            reg = reg[['timestamp', 'supi', 'state_desc']].copy()
+            reg['timestamp'] = pd.to_datetime(reg['timestamp'])
+            new = _newer_than_stored(reg, self.registration, 'timestamp', key='supi')
+            if new.empty:
+                return 0
+            last = self.registration.sort_values('timestamp').groupby('supi').tail(1)
+            combined = pd.concat([last[['timestamp', 'supi', 'state_desc']].assign(_new=False),
+                                  new.assign(_new=True)]) if len(last) else new.assign(_new=True)
+            combined['timestamp'] = pd.to_datetime(combined['timestamp'])
+            combined = combined.sort_values(['supi', 'timestamp'], kind='stable')
+            # Keep only state changes
+            combined = combined[
+                ~(combined['supi'] == combined['supi'].shift()) |
+                ~(combined['state_desc'] == combined['state_desc'].shift())
+            ]
+            # Calculate duration in minutes
+            combined['duration_minutes'] = (
+                combined.groupby('supi')['timestamp'].diff().shift(-1).dt.total_seconds() / 60
+            )
+
+            closed = combined[~combined['_new'].values]
+            self.registration.loc[closed.index, 'duration_minutes'] = closed['duration_minutes']
+            added = combined[combined['_new'].values].drop(columns='_new').sort_values('timestamp', kind='stable')
+            start = self.registration.index.max() + 1 if len(self.registration) else 0
+            added.index = pd.RangeIndex(start, start + len(added))
+            self.registration = pd.concat([self.registration, added]) if len(self.registration) else added
+            if self.window is not None:
+                self.registration = self.registration[
+                    self.registration['timestamp'] >= self.registration['timestamp'].max() - self.window]
+            return len(added)
+
+    ###################### Active UEs ######################
+
+    def append_active(self, changes):
+        """ Add active_UEs changes (timestamp, active_UEs); the previous last row gets its duration. """
+        with self._lock:
+            changes = changes[['timestamp', 'active_UEs']].copy()
+            changes['timestamp'] = pd.to_datetime(changes['timestamp'])
+            new = _newer_than_stored(changes, self.active, 'timestamp').sort_values('timestamp')
+            previous = self.active['active_UEs'].iloc[-1] if len(self.active) else None
+            # Remove duplicate consecutive values
+            new = new[new['active_UEs'] != new['active_UEs'].shift(fill_value=previous)]
+            if new.empty:
+                return 0
+            if len(self.active):
+                self.active.loc[self.active.index[-1], 'duration'] = new['timestamp'].iloc[0] - self.active['timestamp'].iloc[-1]
+            new['duration'] = (new['timestamp'].shift(-1) - new['timestamp']).fillna(pd.Timedelta(seconds=0))
+            # Feature engineering
+            new['hour_of_day'] = new['timestamp'].dt.hour
+            new['minute_of_hour'] = new['timestamp'].dt.minute
+            new['day_of_week'] = new['timestamp'].dt.dayofweek
+            self.active = pd.concat([self.active, new], ignore_index=True) if len(self.active) else new.reset_index(drop=True)
+            if self.window is not None:
+                self.active = self.active[
+                    self.active['timestamp'] >= self.active['timestamp'].max() - self.window].reset_index(drop=True)
+            return len(new)
@@ -0,0 +1,107 @@
+# forecast.py
+#
+# Multi-step forecasts for active_UEs{state="current"} from a seasonal
+# (weekday x hour) profile. The profile is a table of running count/sum/
+# sum-of-squares that is extended with only the samples that arrived since
+# the last refresh (read from the shared AnLF feature store), so it can be
+# updated on every scrape. Forecasts are read straight from the table;
+# nothing is refit per query.
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+import AnLF
+
+SAMPLE_STEP = pd.Timedelta(minutes=5)       # matches the active_UEs scrape step
+PERSISTENCE = pd.Timedelta(hours=1)         # how fast the current deviation from the profile fades
+Z_90 = 1.645
+
+
+class SeasonalProfile:
+    """ Running mean/variance of the active UE count per (day_of_week, hour_of_day). """
+
+    def __init__(self, step=SAMPLE_STEP):
+        self.step = step
+        self.n = np.zeros((7, 24))
+        self.sum = np.zeros((7, 24))
+        self.sumsq = np.zeros((7, 24))
+        self.last_change = None     # (timestamp, value) of the newest change seen
+        self.next_sample = None     # first grid point not yet added to the table
+
+    def update(self, changes):
+        """
+        Extend the profile with change events (timestamp, active_UEs) as
+        returned by AnLF.get_df_active. The count is a step function, so it
+        is sampled on a regular grid up to the newest change.
+        """
+        changes = changes.sort_values('timestamp')
+        if self.last_change is not None:
+            changes = changes[changes['timestamp'] > self.last_change[0]]
+        if changes.empty:
+            return 0
+        times = changes['timestamp'].values
+        values = changes['active_UEs'].values.astype(float)
+        if self.last_change is not None:
+            times = np.concatenate([[np.datetime64(self.last_change[0])], times])
+            values = np.concatenate([[self.last_change[1]], values])
+
+        start = self.next_sample if self.next_sample is not None else pd.Timestamp(times[0]).ceil(self.step)
+        grid = pd.date_range(start, pd.Timestamp(times[-1]), freq=self.step)
+        if len(grid):
+            sampled = values[np.searchsorted(times, grid.values, side='right') - 1]
+            cells = (grid.dayofweek.values, grid.hour.values)
+            np.add.at(self.n, cells, 1)
+            np.add.at(self.sum, cells, sampled)
+            np.add.at(self.sumsq, cells, sampled * sampled)
+            self.next_sample = grid[-1] + self.step
+        self.last_change = (pd.Timestamp(times[-1]), values[-1])
+        return len(grid)
+
+    def stats(self):
+        """ Mean and standard deviation per cell; empty cells fall back to the overall stats. """
+        total = self.n.sum()
+        overall_mean = self.sum.sum() / total
+        overall_var = max(self.sumsq.sum() / total - overall_mean ** 2, 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(self.n > 0, self.sum / self.n, overall_mean)
+            var = np.where(self.n > 1, self.sumsq / self.n - mean ** 2, overall_var)
+        return mean, np.sqrt(np.clip(var, 0.0, None))
+
+    def forecast(self, horizon, step, z=Z_90):
+        if self.last_change is None:
+            raise ValueError("No active_UEs samples available for forecasting.")
+        mean, std = self.stats()
+        origin, current = self.last_change
+        times = pd.date_range(origin + step, periods=horizon, freq=step)
+        base = mean[times.dayofweek, times.hour]
+        spread = std[times.dayofweek, times.hour]
+        # Start from the current value and relax towards the seasonal mean.
+        deviation = current - mean[origin.dayofweek, origin.hour]
+        decay = np.exp(-((times - origin) / PERSISTENCE).values.astype(float))
+        point = base + deviation * decay
+        return [
+            {'timestamp': t.strftime('%Y-%m-%d %H:%M:%S'), 'forecast': round(float(p), 2),
+             'lower': round(max(float(p - z * s), 0.0), 2), 'upper': round(float(p + z * s), 2)}
+            for t, p, s in zip(times, point, spread)
+        ]
+
+
+_profile = SeasonalProfile()
+_lock = threading.Lock()
+
+
+def refresh_profile():
+    """ Add the active_UEs changes that arrived since the last refresh to the profile. """
+    with _lock:
+        changes = AnLF.get_active_changes()
+        if not changes.empty:
+            _profile.update(changes)
+        return _profile
+
+
+def forecast_ActiveUE_count(horizon=None, step_minutes=60):
+    """ Hours-ahead active UE curve with 90% intervals; `horizon` is the number of steps. """
+    profile = refresh_profile()
+    return profile.forecast(int(horizon or 12), pd.Timedelta(minutes=step_minutes))
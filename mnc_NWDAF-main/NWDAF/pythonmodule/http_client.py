@@ -0,0 +1,221 @@
+# http_client.py
+#
+# Shared HTTP client layer for the NWDAF Python code: one pooled keep-alive
+# session per endpoint, per-endpoint timeouts, bounded retries with jittered
+# exponential backoff inside a deadline, a circuit breaker that fails fast
+# while an endpoint keeps failing, and latency statistics.
+#
+#   from http_client import get_client, prometheus_get
+#   prometheus_get('/api/v1/series', {'match[]': 'UE_location_report', ...})
+#   get_client('nwdaf').post('/nwdaf/command', json={...}).json()
+#
+#   NWDAF_PROMETHEUS_URL   Prometheus base URL (default http://localhost:9090)
+#   NWDAF_COMMAND_URL      NWDAF command endpoint base URL (default http://127.0.0.71:8001)
+#
+# Idempotent requests (GET) are retried on connection errors, timeouts and
+# 429/502/503/504; other methods only when the connection could not be
+# opened, so a subscribe is never sent twice. CircuitOpenError derives from
+# requests.ConnectionError, so existing RequestException handlers apply.
+
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+# endpoint name -> settings; timeouts are (connect, read) seconds and
+# `deadline` bounds a call including its retries and backoff
+ENDPOINTS = {
+    'prometheus': {
+        'url': os.getenv('NWDAF_PROMETHEUS_URL', 'http://localhost:9090'),
+        'timeout': (3.05, 60), 'retries': 3, 'deadline': 120, 'pool_size': 8,
+    },
+    'nwdaf': {
+        'url': os.getenv('NWDAF_COMMAND_URL', 'http://127.0.0.71:8001'),
+        'timeout': (1.0, 5.0), 'retries': 2, 'deadline': 10, 'pool_size': 2,
+    },
+}
+RETRY_STATUSES = frozenset([429, 502, 503, 504])
+IDEMPOTENT = frozenset(['GET', 'HEAD', 'OPTIONS'])
+BACKOFF = 0.25              # first backoff cap in seconds, doubled per attempt
+MAX_BACKOFF = 4.0
+FAILURE_THRESHOLD = 5       # consecutive failures that open the circuit
+RESET_TIMEOUT = 30.0        # seconds before an open circuit lets a trial request through
+LATENCY_WINDOW = 1000       # latest request latencies kept per endpoint
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """ The endpoint failed repeatedly; requests are rejected until RESET_TIMEOUT has passed. """
+
+
+class CircuitBreaker:
+    """ closed -> open after `threshold` consecutive failures -> half-open after `reset_timeout` -> closed on success """
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - self.opened_at >= self.reset_timeout else 'open'
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial:
+                return False
+            self.trial = True       # one request probes the endpoint
+            return True
+
+    def success(self):
+        with self._lock:
+            self.failures, self.opened_at, self.trial = 0, None, False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.threshold:
+                self.opened_at, self.trial = time.monotonic(), False
+
+
+class LatencyStats:
+    """ Counters and a sliding window of request latencies (seconds). """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.counts = {'requests': 0, 'errors': 0, 'retries': 0, 'rejected': 0}
+        self._lock = threading.Lock()
+
+    def add(self, seconds=None, **counts):
+        with self._lock:
+            if seconds is not None:
+                self.latencies.append(seconds)
+            for name, n in counts.items():
+                self.counts[name] += n
+
+    def snapshot(self):
+        with self._lock:
+            latencies = np.array(self.latencies)
+            summary = dict(self.counts)
+        if len(latencies):
+            p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+            summary.update(p50_ms=round(float(p50), 1), p90_ms=round(float(p90), 1), p99_ms=round(float(p99), 1),
+                           max_ms=round(float(latencies.max()) * 1000, 1))
+        return summary
+
+
+class HttpClient:
+    """ One endpoint: pooled session, timeouts, retries with jitter, circuit breaker, latency stats. """
+
+    def __init__(self, name, url, timeout=(3.05, 60), retries=2, deadline=60, pool_size=4,
+                 failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.name = name
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.retries = retries
+        self.deadline = deadline
+        self.session = requests.Session()
+        # retries are done here, so they can be counted and kept inside the deadline
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.stats = LatencyStats()
+
+    @staticmethod
+    def _retryable(method, error=None, response=None):
+        if response is not None:
+            return method in IDEMPOTENT and response.status_code in RETRY_STATUSES
+        if method in IDEMPOTENT:
+            return isinstance(error, (requests.ConnectionError, requests.Timeout))
+        # the request never left this host
+        reason = getattr(error.args[0], 'reason', None) if error is not None and error.args else None
+        return isinstance(error, requests.ConnectTimeout) or isinstance(reason, NewConnectionError)
+
+    def request(self, method, path, timeout=None, **kwargs):
+        method = method.upper()
+        started = time.monotonic()
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                self.stats.add(rejected=1)
+                raise CircuitOpenError(f"{self.name} ({self.url}) is failing, not sending {method} {path}")
+            sent = time.monotonic()
+            error = response = None
+            try:
+                response = self.session.request(method, self.url + path, timeout=timeout or self.timeout, **kwargs)
+            except requests.RequestException as e:
+                error = e
+            self.stats.add(time.monotonic() - sent, requests=1)
+            failed = error is not None or response.status_code >= 500
+            if failed:
+                self.breaker.failure()
+                self.stats.add(errors=1)
+            else:
+                self.breaker.success()
+            pause = random.uniform(0, min(MAX_BACKOFF, BACKOFF * 2 ** attempt))   # full jitter
+            if (attempt < self.retries and self._retryable(method, error, response)
+                    and time.monotonic() - started + pause < self.deadline):
+                self.stats.add(retries=1)
+                time.sleep(pause)
+                continue
+            if error is not None:
+                raise error
+            return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def report(self):
+        return dict(url=self.url, circuit=self.breaker.state, **self.stats.snapshot())
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(name, url=None):
+    """ Process-wide client for an ENDPOINTS entry, optionally on another base URL. """
+    settings = {key: value for key, value in ENDPOINTS[name].items() if key != 'url'}
+    url = url or ENDPOINTS[name]['url']
+    with _clients_lock:
+        if (name, url) not in _clients:
+            _clients[name, url] = HttpClient(name, url, **settings)
+        return _clients[name, url]
+
+
+def prometheus_get(path, params, url=None, timeout=None):
+    """ GET a Prometheus HTTP API path and return its 'data', raising on HTTP or API errors. """
+    response = get_client('prometheus', url).get(path, params=params, timeout=timeout)
+    response.raise_for_status()
+    body = response.json()
+    if body.get('status') != 'success':
+        raise RuntimeError(f"Prometheus query failed: {body.get('error', body)}")
+    return body['data']
+
+
+def query_range(query, start_time, end_time, step, url=None):
+    """ Matrix result of one /api/v1/query_range call (datetimes or epoch seconds), like custom_query_range. """
+    start, end = (t.timestamp() if hasattr(t, 'timestamp') else float(t) for t in (start_time, end_time))
+    return prometheus_get('/api/v1/query_range', {'query': query, 'start': start, 'end': end, 'step': step},
+                          url)['result']
+
+
+def latency_report():
+    """ endpoint -> counters, circuit state and p50/p90/p99/max latency of every client in use. """
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {f"{client.name} {client.url}": client.report() for client in clients}
@@ -1,62 +1,89 @@
-from flask import Flask, request
+import importlib
 import json
-from MTLF import *
-from AnLF import *
-from Model import *
 import sys
 import os
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from pythonmodule import MTLF, AnLF
+# Address of the long-lived analytics worker (`python3 main.py --serve`).
+# producer/api_analytics.go posts the same JSON it would pass on argv.
+WORKER_HOST = os.getenv('NWDAF_ANALYTICS_HOST', '127.0.0.1')
+WORKER_PORT = int(os.getenv('NWDAF_ANALYTICS_PORT', '9538'))
 
-# app = Flask(__name__)
+# analyticsId -> (backend module, function, request fields passed as arguments).
+# A backend is only imported the first time its analytics type is requested,
+# so a handover request never pays for TensorFlow (MTLF/Model).
+ANALYTICS = {
+    'UE_MOBILITY': ('AnLF', 'predict_ue_location', ['TargetUe']),
+    'UE_MOBILITY_BATCH': ('AnLF', 'predict_ue_locations', ['TargetUe']),
+    'UE_MOBILITY_MARKOV': ('markov', 'predict_next_cell', ['TargetUe', 'TargetTime']),
+    'UE_REG_DURATION': ('AnLF', 'predict_duration', ['TargetUe']),
+    'UE_REG_DURATION_BATCH': ('AnLF', 'predict_durations', ['TargetUe']),
+    'ACTIVE_UE_COUNT': ('AnLF', 'predict_ActiveUE_count', []),
+    'ACTIVE_UE_FORECAST': ('forecast', 'forecast_ActiveUE_count', ['Horizon']),
+    'MODEL_TRAINING': ('MTLF', 'MTLF', []),
+}
+DEFAULT_ANALYTICS = 'UE_MOBILITY'
 
-# @app.route('/', methods=['GET', 'POST'])
-# def parser():
-#     data = {}
-#     if request.method == 'POST':
-#         data = request.json
-#         print(data)
 
-#         if str(data['nfService']) == 'training':
-#             MTLF(model)
-#             data["data"] = "training finish"
-#         elif str(data['nfService']) == 'inference':
-#             inference_result = AnLF.AnLF(model,int(data['data']))
-#             data["data"] = str(inference_result)
-#         else:
-#             data['data'] = "None (Wrong)"
+def load_analytics(analytics_id):
+    """ Import the backend for an analytics type and return its entry point. """
+    if analytics_id not in ANALYTICS:
+        raise ValueError(f"Unknown analyticsId: {analytics_id}. Valid ids are: {', '.join(ANALYTICS)}")
+    module_name, function_name, _ = ANALYTICS[analytics_id]
+    return getattr(importlib.import_module(module_name), function_name)
 
-#         data['reqNFInstanceID'] = data['reqNFInstanceID'] + 'hi'
-#         data['nfService'] = data['nfService'] + '(reply)'
-#         data['reqTime'] = data['reqTime']
-
-#     return json.dumps(data)
 
+def handle_analytics(json_param):
+    analytics_id = json_param.get('analyticsId') or DEFAULT_ANALYTICS
+    if analytics_id not in ANALYTICS:
+        # Older callers put free-form ids here and always meant handover.
+        print(f"Unknown analyticsId {analytics_id}, using {DEFAULT_ANALYTICS}")
+        analytics_id = DEFAULT_ANALYTICS
+    target_ue = json_param.get('TargetUe')
+    if analytics_id in ('UE_MOBILITY', 'UE_REG_DURATION') and (isinstance(target_ue, list) or target_ue == 'all'):
+        # A list of SUPIs or "all" asks for fleet-wide prediction in one pass.
+        analytics_id += '_BATCH'
+    print(f"Received {analytics_id} Analytics Request for")
+    print(f"target_ue: {json_param.get('TargetUe')}")
+    print(f"target_time: {json_param.get('TargetTime')}")
+    func = load_analytics(analytics_id)
+    args = [json_param.get(field) for field in ANALYTICS[analytics_id][2]]
+    return func(*args)
 
 def analytics():
-    data = {}
     json_param = json.loads(sys.argv[1])
-    print(f"Received Handover Analytics Request for")
-    print(f"target_ue: {json_param.get('TargetUe')}")
-    print(f"target_time: {json_param.get('TargetTime')}")
-    # if str(json_param.get('nfService')) == 'training':
-    #     MTLF(model)
-    #     data["data"] = "training finish"
-    #     print("training")
-    # elif str(json_param.get('nfService')) == 'inference':
-    #     inference_result = AnLF.predict_ue_location(json_param.get('target_ue') ,json_param.get('target_time'))
-    #     data["data"] = str(inference_result)
-    #     print("analytics")
-    # else:
-    #     data['data'] = "None (Wrong)"
-    result = AnLF.predict_ue_location(json_param.get('TargetUe'))# ,json_param.get('TargetTime'))
-    # data["result"] = str(result)
-    # print("analytics")
-    return json.dumps(result)
+    return json.dumps(handle_analytics(json_param), default=str)
 
-if __name__ == '__main__':
-    # app.run(port=9538)
-    print(analytics())
-    # random()
+def serve():
+    from flask import Flask, Response, request
 
+    app = Flask(__name__)
+
+    @app.route('/', methods=['GET', 'POST'])
+    def parser():
+        json_param = request.get_json(force=True)
+        try:
+            result = handle_analytics(json_param)
+        except ValueError as e:
+            return Response(json.dumps({'error': str(e)}), status=400, mimetype='application/json')
+        return Response(json.dumps(result, default=str), mimetype='application/json')
+
+    @app.route('/stats', methods=['GET'])
+    def stats():
+        # request counts, circuit state and latency percentiles of the outbound clients
+        from http_client import latency_report
+        return Response(json.dumps(latency_report()), mimetype='application/json')
+
+    # Fill the data/model cache before accepting requests so the first
+    # request does not pay for the imports, the Prometheus pull and the fit.
+    try:
+        load_analytics(DEFAULT_ANALYTICS)
+        importlib.import_module('AnLF').get_location_model()
+    except Exception as e:
+        print(f"Warm-up failed, the first request will retry: {e}")
+    app.run(host=WORKER_HOST, port=WORKER_PORT, threaded=True)
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--serve':
+        serve()
+    else:
+        print(analytics())
@@ -0,0 +1,189 @@
+# markov.py
+#
+# Streaming handover predictor: transition counts keyed by
+# (supi, prev_cell_1, prev_cell_2, time_of_day), the same context the
+# GradientBoosting pipeline in AnLF.predict_ue_location learns from.
+# Every location event is one O(1) counter update and every query is a
+# dictionary lookup, so there is no training step to schedule.
+#
+#   python3 markov.py [df_location.csv ...]   # accuracy vs. GBM on the same split
+
+import glob
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+import AnLF
+from features import get_time_of_day
+from prom_decode import as_compact_int
+
+DATASET_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'core dataset'))
+# Seed the counts from the exported location history on first use, so they do
+# not depend on the 10-day Prometheus window alone (NWDAF_MARKOV_BACKFILL=0 turns it off)
+BACKFILL = os.getenv('NWDAF_MARKOV_BACKFILL', '1') == '1'
+
+
+class TransitionPredictor:
+    """
+    Next-cell counts per UE context, with back-off to coarser contexts when
+    the full one has not been seen yet:
+      (supi, prev_cell_1, prev_cell_2, time_of_day) -> (supi, prev_cell_1, prev_cell_2)
+      -> (supi, prev_cell_1) -> (prev_cell_1,)
+    """
+
+    def __init__(self):
+        self.levels = [defaultdict(Counter) for _ in range(4)]
+        self.history = {}       # supi -> (current cell, previous cell)
+        self.last_time = {}     # supi -> time of the newest event seen
+        self.last_tod = {}      # supi -> time_of_day of the newest event seen
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _keys(supi, prev_cell_1, prev_cell_2, time_of_day):
+        return [
+            (supi, prev_cell_1, prev_cell_2, time_of_day),
+            (supi, prev_cell_1, prev_cell_2),
+            (supi, prev_cell_1),
+            (prev_cell_1,),
+        ]
+
+    def _count(self, supi, prev_cell_1, prev_cell_2, time_of_day, next_cell, n=1):
+        for level, key in zip(self.levels, self._keys(supi, prev_cell_1, prev_cell_2, time_of_day)):
+            level[key][next_cell] += n
+
+    def update(self, supi, cell, event_time):
+        """ Apply one UE_location_report event. """
+        with self._lock:
+            current, previous = self.history.get(supi, (None, None))
+            if cell == current:
+                return      # same-cell reports are not handovers (see get_df_location)
+            time_of_day = get_time_of_day(event_time.hour)
+            if current is not None and previous is not None:
+                self._count(supi, current, previous, time_of_day, cell)
+            self.history[supi] = (cell, current)
+            self.last_time[supi] = event_time
+            self.last_tod[supi] = time_of_day
+
+    def observe(self, events):
+        """ Apply all events newer than what has been seen per UE (time, supi, NrCellId columns). """
+        events = events.sort_values('time')
+        seen = pd.to_datetime(events['supi'].map(self.last_time))
+        new = events[seen.isna() | (events['time'] > seen)]
+        for row in new.itertuples(index=False):
+            self.update(row.supi, row.NrCellId, row.time)
+        return len(new)
+
+    def backfill_csv(self, paths):
+        """ Replay exported location CSVs (core dataset/*/df_location.csv, df_NNNN.csv). """
+        frames = [pd.read_csv(path, dtype={'NrCellId': str, 'supi': str, 'tac': str}) for path in paths]
+        events = pd.concat(frames, ignore_index=True)
+        events['time'] = pd.to_datetime(events['time'])
+        # same cell ids as the live events (AnLF.get_location_events)
+        events['NrCellId'] = as_compact_int(events['NrCellId'])
+        return self.observe(events.drop_duplicates(['time', 'supi']))
+
+    def fit_features(self, df_model):
+        """ Bulk-load counts from an AnLF feature frame (one row per observed transition). """
+        grouped = df_model.groupby(['supi', 'prev_cell_1', 'prev_cell_2', 'time_of_day', 'NrCellId']).size()
+        for (supi, prev_cell_1, prev_cell_2, time_of_day, next_cell), n in grouped.items():
+            self._count(supi, prev_cell_1, prev_cell_2, time_of_day, next_cell, n)
+
+    def distribution(self, supi, prev_cell_1, prev_cell_2, time_of_day):
+        for level, key in zip(self.levels, self._keys(supi, prev_cell_1, prev_cell_2, time_of_day)):
+            counts = level.get(key)
+            if counts:
+                return counts
+        return None
+
+    def predict(self, supi, at=None):
+        current, previous = self.history.get(supi, (None, None))
+        if current is None or previous is None:
+            return {'target_ue': supi, 'error': "Need at least two historical cells for this UE."}
+        time_of_day = get_time_of_day(at.hour) if at is not None else self.last_tod[supi]
+        counts = self.distribution(supi, current, previous, time_of_day)
+        if not counts:
+            return {'target_ue': supi, 'error': f"No transitions seen from cell {current}."}
+        total = sum(counts.values())
+        next_cell, n = counts.most_common(1)[0]
+        return {
+            'predicted_cell': int(next_cell),
+            'target_ue': supi,
+            'probability': n / total,
+            'probabilities': {int(cell): c / total for cell, c in counts.items()},
+        }
+
+
+predictor = TransitionPredictor()
+_backfilled = False
+_backfill_lock = threading.Lock()
+
+
+def history_paths(dataset_dir=DATASET_DIR):
+    """ df_location.csv exports of the dated dataset folders (the df_NNNN.csv traces are separate recordings). """
+    return sorted(glob.glob(os.path.join(dataset_dir, '*', 'df_location.csv')))
+
+
+def ensure_backfilled():
+    """ Replay the exported history into `predictor` once, before the first live events. """
+    global _backfilled
+    with _backfill_lock:
+        if _backfilled or not BACKFILL:
+            return
+        paths = history_paths()
+        if paths:
+            print(f"Markov backfill: {predictor.backfill_csv(paths)} events from {len(paths)} exports")
+        _backfilled = True
+
+
+def predict_next_cell(target_ue, target_time=None):
+    """
+    Analytics entry point: catch up on new events, then answer from counts.
+    `target_time` picks the time-of-day context; default is that of the UE's latest event.
+    """
+    at = pd.Timestamp(target_time) if target_time else None
+    ensure_backfilled()
+    predictor.observe(AnLF.get_location_events())
+    if target_ue == 'all':
+        target_ue = sorted(predictor.history)
+    if isinstance(target_ue, list):
+        return [predictor.predict(ue, at) for ue in target_ue]
+    return predictor.predict(target_ue, at)
+
+
+def evaluate(events):
+    """ Markov vs. GBM accuracy on the split used by AnLF.fit_location_model. """
+    df_model = AnLF.build_location_features(events.copy())
+    train, test = train_test_split(df_model, test_size=0.2, random_state=42)
+
+    start = time.perf_counter()
+    markov = TransitionPredictor()
+    markov.fit_features(train)
+    predicted = []
+    for row in test.itertuples(index=False):
+        counts = markov.distribution(row.supi, row.prev_cell_1, row.prev_cell_2, row.time_of_day)
+        predicted.append(counts.most_common(1)[0][0] if counts else None)
+    markov_time = time.perf_counter() - start
+    markov_acc = (pd.Series(predicted, index=test.index) == test['NrCellId']).mean()
+
+    start = time.perf_counter()
+    pipeline = AnLF.fit_location_model(df_model)
+    gbm_acc = (pipeline.predict(test[AnLF.LOCATION_FEATURES]) == test['NrCellId']).mean()
+    gbm_time = time.perf_counter() - start
+    return {'rows': len(df_model), 'markov_accuracy': markov_acc, 'markov_seconds': markov_time,
+            'gbm_accuracy': gbm_acc, 'gbm_seconds': gbm_time}
+
+
+if __name__ == '__main__':
+    paths = sys.argv[1:] or sorted(glob.glob(os.path.join(DATASET_DIR, '*', 'df_location.csv'))
+                                   + glob.glob(os.path.join(DATASET_DIR, 'df_*.csv')))
+    for path in paths:
+        events = pd.read_csv(path, dtype={'NrCellId': str, 'supi': str, 'tac': str})
+        result = evaluate(events)
+        print(f"{os.path.relpath(path, DATASET_DIR)}: {result['rows']} transitions | "
+              f"markov {result['markov_accuracy']:.3f} ({result['markov_seconds']:.3f}s) | "
+              f"gbm {result['gbm_accuracy']:.3f} ({result['gbm_seconds']:.3f}s)")
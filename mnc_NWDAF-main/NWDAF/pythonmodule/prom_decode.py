@@ -0,0 +1,55 @@
+# prom_decode.py
+#
+# Shared decoding of Prometheus API responses into typed, NumPy-backed
+# columns. Used by AnLF.py here and by prom_query.py at the repository root.
+#
+#   SUPI            categorical (optionally without the 'imsi-' prefix)
+#   NrCellId / tac  int32
+#   event times     datetime64, parsed in one vectorized call
+#   sample values   float64 arrays concatenated across series
+
+import numpy as np
+import pandas as pd
+
+
+def labels_frame(label_sets, columns):
+    """ Label dicts (entry['metric'] or /api/v1/series items) -> one object column per label. """
+    return pd.DataFrame({column: [labels.get(column) for labels in label_sets] for column in columns})
+
+
+def parse_times(strings):
+    """ '2025-02-21 12:07:28.783806274 +0000 UTC' -> naive datetime64, for the whole column at once. """
+    strings = pd.Series(strings, dtype=object)
+    return pd.to_datetime(strings.str.split(' +', n=1, regex=False).str[0].str.strip(), format='ISO8601')
+
+
+def as_supi(strings, strip_prefix=True):
+    strings = pd.Series(strings, dtype=object)
+    if strip_prefix:
+        strings = strings.str.replace('imsi-', '', n=1, regex=False)
+    return strings.astype('category')
+
+
+def as_compact_int(strings):
+    """ Zero-padded ids such as '000000040' -> int32 """
+    return pd.to_numeric(pd.Series(strings, dtype=object)).astype('int32')
+
+
+def matrix_frame(result, value_name='value', label=None):
+    """
+    Matrix (or vector) result -> long frame with 'sample_time' (epoch seconds)
+    and `value_name` as float64 columns, plus `label` as a categorical column
+    when given. Each series' [[ts, "v"], ...] is converted by NumPy in one go
+    instead of building a Python object per sample.
+    """
+    arrays = [np.asarray(series['values'] if 'values' in series else [series['value']], dtype=float).reshape(-1, 2)
+              for series in result or []]
+    columns = ['sample_time', value_name] + ([label] if label else [])
+    if not arrays:
+        return pd.DataFrame(columns=columns)
+    stacked = np.concatenate(arrays)
+    frame = pd.DataFrame({'sample_time': stacked[:, 0], value_name: stacked[:, 1]})
+    if label:
+        names = [series['metric'].get(label, 'unknown') for series in result]
+        frame[label] = pd.Categorical(np.repeat(names, [len(a) for a in arrays]))
+    return frame
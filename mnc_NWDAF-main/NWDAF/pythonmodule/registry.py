@@ -0,0 +1,72 @@
+import hashlib
+import os
+import threading
+
+import joblib
+import pandas as pd
+
+# Fitted AnLF models are kept here between worker restarts and one-shot runs.
+MODEL_DIR = os.getenv('NWDAF_MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+
+
+def fingerprint(data):
+    """ Hash of a training frame; it only changes when the data itself does. """
+    h = hashlib.sha1()
+    h.update(','.join(map(str, data.columns)).encode())
+    h.update(pd.util.hash_pandas_object(data, index=False).values.tobytes())
+    return h.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Fit-once cache for trained models.
+
+    Each model is stored under a name together with the fingerprint of the
+    data it was trained on. `get` returns the in-memory model, falls back to
+    the artifact on disk and only calls `fit` when the fingerprint differs.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR):
+        self.model_dir = model_dir
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _paths(self, name):
+        base = os.path.join(self.model_dir, name)
+        return base + '.joblib', base + '.fingerprint'
+
+    def _load(self, name, fp):
+        model_path, fp_path = self._paths(name)
+        if not os.path.isfile(fp_path) or not os.path.isfile(model_path):
+            return None
+        with open(fp_path) as f:
+            if f.read().strip() != fp:
+                return None
+        return joblib.load(model_path)
+
+    def _save(self, name, fp, model):
+        os.makedirs(self.model_dir, exist_ok=True)
+        model_path, fp_path = self._paths(name)
+        # Write to temp files first so a crash never leaves a model paired
+        # with the fingerprint of a different training window.
+        joblib.dump(model, model_path + '.tmp')
+        with open(fp_path + '.tmp', 'w') as f:
+            f.write(fp)
+        os.replace(model_path + '.tmp', model_path)
+        os.replace(fp_path + '.tmp', fp_path)
+
+    def get(self, name, data, fit):
+        fp = fingerprint(data)
+        with self._lock:
+            cached = self._models.get(name)
+            if cached is not None and cached[0] == fp:
+                return cached[1]
+            model = self._load(name, fp)
+            if model is None:
+                model = fit(data)
+                self._save(name, fp, model)
+            self._models[name] = (fp, model)
+            return model
+
+
+registry = ModelRegistry()
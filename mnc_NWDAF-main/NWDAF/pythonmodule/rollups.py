@@ -0,0 +1,189 @@
+# rollups.py
+#
+# Downsampled tiers of the two step-function metrics in the event store
+# (event_store.py), so long-horizon questions ("how did active UEs trend this
+# month") read a few hundred buckets instead of every 5m sample:
+#
+#   active_rollup         tier, bucket_ns, seconds, min, max, mean, last         active_UEs
+#   registration_rollup   tier, supi, bucket_ns, seconds, min, max, mean, last   registration state, per SUPI
+#
+# Tiers are 5m, 1h and 1d buckets aligned to UTC epoch multiples. `mean` is
+# time-weighted (for registration it is the uptime ratio), `seconds` is how
+# much of the bucket the data covers and `last` is the value at its end.
+# The 5m tier is computed from the stored transitions and the coarser tiers
+# from the 5m one. EventStore.ingest() calls update() after every pass,
+# which recomputes from the start of the day the previous pass ended in, so
+# an update touches at most a day plus the new data.
+
+import numpy as np
+import pandas as pd
+
+TIERS = {'5m': 300, '1h': 3600, '1d': 86400}
+FINEST, COARSEST = min(TIERS.values()), max(TIERS.values())
+NS = 1_000_000_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS active_rollup (
+    tier INTEGER NOT NULL, bucket_ns INTEGER NOT NULL,
+    seconds REAL, min REAL, max REAL, mean REAL, last REAL,
+    PRIMARY KEY (tier, bucket_ns)) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS registration_rollup (
+    tier INTEGER NOT NULL, supi TEXT NOT NULL, bucket_ns INTEGER NOT NULL,
+    seconds REAL, min REAL, max REAL, mean REAL, last REAL,
+    PRIMARY KEY (tier, supi, bucket_ns)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS registration_rollup_time ON registration_rollup (tier, bucket_ns);
+
+CREATE TABLE IF NOT EXISTS rollup_state (
+    name TEXT PRIMARY KEY, until_ns INTEGER NOT NULL);
+"""
+
+# rollup table -> (event store table, value column, ingested metric it follows)
+SOURCES = {
+    'active_rollup': ('active', 'active_UEs', 'active_UEs'),
+    'registration_rollup': ('registration', 'state', 'amf_ue_registration_state'),
+}
+COLUMNS = ['bucket_ns', 'seconds', 'min', 'max', 'mean', 'last']
+
+
+def _seconds(resolution):
+    return pd.Timedelta(resolution).total_seconds() if isinstance(resolution, str) else float(resolution)
+
+
+def tier_for(resolution):
+    """ Coarsest tier (seconds) no coarser than `resolution` ('1h', '2d', 900 ...), None below 5m. """
+    fitting = [tier for tier in TIERS.values() if tier <= _seconds(resolution)]
+    return max(fitting) if fitting else None
+
+
+def bucket_width(resolution):
+    """ Width of the returned buckets: `resolution` when it is a whole number of its tier, else the tier. """
+    tier, seconds = tier_for(resolution), _seconds(resolution)
+    return int(seconds) if tier and seconds % tier == 0 else tier
+
+
+def step_buckets(times_ns, values, start_ns, end_ns, width):
+    """
+    Buckets of `width` seconds over [start_ns, end_ns) of the step function
+    that takes values[i] from times_ns[i] (sorted) until the next change.
+    Time before the first change is not covered.
+    """
+    width_ns = width * NS
+    times_ns = np.asarray(times_ns, dtype='int64')
+    values = np.asarray(values, dtype=float)
+    if len(times_ns) == 0 or end_ns <= start_ns:
+        return pd.DataFrame(columns=COLUMNS)
+    edges = np.arange(start_ns - start_ns % width_ns + width_ns, end_ns, width_ns)
+    inside = times_ns[(times_ns > start_ns) & (times_ns < end_ns)]
+    bounds = np.unique(np.concatenate([[start_ns], inside, edges, [end_ns]]))
+    seg_start, seg_length = bounds[:-1], np.diff(bounds)
+    index = np.searchsorted(times_ns, seg_start, side='right') - 1
+    known = index >= 0
+    seg = pd.DataFrame({'bucket_ns': seg_start[known] - seg_start[known] % width_ns,
+                        'seconds': seg_length[known] / NS, 'value': values[index[known]]})
+    return _combine(seg.assign(weighted=seg['value'] * seg['seconds'], min=seg['value'], max=seg['value'],
+                               last=seg['value']))
+
+
+def coarsen(buckets, width):
+    """ Finer buckets -> `width`-second buckets (rows sorted by bucket_ns). """
+    if buckets.empty:
+        return pd.DataFrame(columns=COLUMNS)
+    width_ns = width * NS
+    return _combine(buckets.assign(bucket_ns=buckets['bucket_ns'] - buckets['bucket_ns'] % width_ns,
+                                   weighted=buckets['mean'] * buckets['seconds']))
+
+
+def resample(buckets, width, key=None):
+    """ coarsen() per `key` group (e.g. per SUPI), keeping the key column. """
+    if key is None or buckets.empty:
+        return coarsen(buckets, width)
+    return pd.concat([coarsen(group, width).assign(**{key: name})
+                      for name, group in buckets.groupby(key, sort=True)], ignore_index=True)
+
+
+def _combine(parts):
+    grouped = parts.groupby('bucket_ns', sort=True)
+    out = grouped.agg(seconds=('seconds', 'sum'), min=('min', 'min'), max=('max', 'max'),
+                      weighted=('weighted', 'sum'), last=('last', 'last'))
+    out['mean'] = out.pop('weighted') / out['seconds'].where(out['seconds'] > 0)
+    return out.reset_index()[COLUMNS]
+
+
+def tiers(times_ns, values, start_ns, end_ns):
+    """ tier seconds -> buckets, all derived from one pass over the transitions. """
+    finest = step_buckets(times_ns, values, start_ns, end_ns, FINEST)
+    return {tier: finest if tier == FINEST else coarsen(finest, tier) for tier in TIERS.values()}
+
+
+class Rollups:
+    """ Rollup tables inside an EventStore's database. """
+
+    def __init__(self, store):
+        self.store = store
+        with store._db() as db:
+            db.executescript(SCHEMA)
+
+    def update(self):
+        """ Bring every tier up to what has been ingested; returns buckets written per table. """
+        written = {}
+        with self.store._db() as db:
+            ingested = dict(db.execute('SELECT metric, until_ns FROM ingest_state').fetchall())
+            done = dict(db.execute('SELECT name, until_ns FROM rollup_state').fetchall())
+        for table, (source, value, metric) in SOURCES.items():
+            until_ns = ingested.get(metric)
+            if until_ns is None:
+                continue
+            if table in done:
+                from_ns = done[table]
+            else:
+                with self.store._db() as db:
+                    from_ns = db.execute(f'SELECT MIN(time_ns) FROM {source}').fetchone()[0]
+                if from_ns is None:
+                    continue
+            # whole days, so the 1d bucket the last pass ended in is rebuilt from complete 5m data
+            from_ns -= from_ns % (COARSEST * NS)
+            transitions = self.store._transitions(source, value, from_ns / NS, until_ns / NS)
+            transitions['time_ns'] = np.round(transitions['sample_time'].values * NS).astype('int64')
+            if table == 'active_rollup':
+                parts = [buckets.assign(tier=tier) for tier, buckets in
+                         tiers(transitions['time_ns'], transitions[value], from_ns, until_ns).items()]
+            else:
+                parts = [buckets.assign(tier=tier, supi=supi) for supi, group in transitions.groupby('supi', sort=True)
+                         for tier, buckets in tiers(group['time_ns'], group[value], from_ns, until_ns).items()]
+            rows = pd.concat([part for part in parts if not part.empty] or [pd.DataFrame()], ignore_index=True)
+            with self.store._db() as db:
+                db.execute(f'DELETE FROM {table} WHERE bucket_ns >= ?', (from_ns,))
+                if not rows.empty:
+                    rows.to_sql(table, db, if_exists='append', index=False)
+                db.execute('INSERT OR REPLACE INTO rollup_state VALUES (?, ?)', (table, until_ns))
+            written[table] = len(rows)
+        return written
+
+    def read(self, table, resolution, start_ns=None, end_ns=None, supi=None):
+        """
+        Buckets of `bucket_width(resolution)` overlapping [start_ns, end_ns),
+        read from the coarsest tier that fits and merged further when the
+        resolution is a multiple of it (e.g. '6h' from the 1h tier). The
+        bucket start is returned as datetime64 in 'time'.
+        """
+        tier, width = tier_for(resolution), bucket_width(resolution)
+        clauses, params = ['tier = ?'], [tier]
+        if start_ns is not None:
+            clauses.append('bucket_ns > ?')
+            params.append(start_ns - start_ns % (width * NS) - tier * NS)
+        if end_ns is not None:
+            clauses.append('bucket_ns < ?')
+            params.append(end_ns)
+        if supi is not None:
+            supis = [str(s).replace('imsi-', '', 1) for s in (supi if isinstance(supi, (list, tuple)) else [supi])]
+            clauses.append(f"supi IN ({','.join('?' * len(supis))})")
+            params += supis
+        key = 'supi' if table == 'registration_rollup' else None
+        columns = ([key] if key else []) + COLUMNS
+        sql = f"SELECT {', '.join(columns)} FROM {table} WHERE {' AND '.join(clauses)} ORDER BY bucket_ns"
+        df = self.store._query(sql, params)
+        if width > tier:
+            df = resample(df, width, key)[columns]
+        df.insert(0, 'time', pd.to_datetime(df.pop('bucket_ns'), unit='ns'))
+        return df
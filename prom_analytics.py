@@ -0,0 +1,131 @@
+# prom_analytics.py
+#
+# Aggregate analytics over the decoded Prometheus frames (prom_query.*_frame),
+# selectable through query_prometheus(promql, aggregate=...). Every aggregate
+# is computed with grouped/vectorized pandas operations and its size depends
+# on the number of UEs, cells, hours or location types -- never on the length
+# of the queried window -- so the LLM gets a compact table instead of the
+# whole raw frame.
+
+import numpy as np
+import pandas as pd
+
+MAX_ROWS = 50          # per-UE / per-cell tables are cut to the busiest entries
+SAMPLE_STEP = '5min'   # grid the active UE step function is sampled on
+
+
+def _dwell(loc):
+    """ Handover events sorted per UE with the minutes spent in each cell (NaN for the current cell). """
+    df = loc.sort_values(['supi', 'time'], kind='stable').copy()
+    by_supi = df.groupby('supi', observed=True)
+    df['prev_cell'] = by_supi['NrCellId'].shift(1)
+    df['dwell_minutes'] = (by_supi['time'].shift(-1) - df['time']).dt.total_seconds() / 60
+    return df
+
+
+def handover_counts(loc, limit=MAX_ROWS):
+    """ Per UE: handovers, distinct cells, mean dwell and the cell it stayed in longest. """
+    df = _dwell(loc)
+    per_ue = df.groupby('supi', observed=True).agg(
+        handovers=('NrCellId', 'size'),
+        cells=('NrCellId', 'nunique'),
+        mean_dwell_minutes=('dwell_minutes', 'mean'),
+        last_seen=('time', 'max'),
+    )
+    per_ue['handovers'] -= 1
+    per_cell = df.groupby(['supi', 'NrCellId'], observed=True)['dwell_minutes'].sum()
+    per_cell = per_cell[per_cell > 0]
+    if len(per_cell):
+        top = per_cell.sort_values(ascending=False, kind='stable').reset_index().drop_duplicates('supi')
+        per_ue['top_cell'] = top.set_index('supi')['NrCellId'].reindex(per_ue.index)
+    else:
+        per_ue['top_cell'] = np.nan
+    per_ue['mean_dwell_minutes'] = per_ue['mean_dwell_minutes'].round(1)
+    return per_ue.sort_values('handovers', ascending=False, kind='stable').head(limit)
+
+
+def cell_dwell(loc, limit=MAX_ROWS):
+    """ Per cell: arrivals, distinct UEs and dwell time statistics in minutes. """
+    df = _dwell(loc)
+    per_cell = df.groupby('NrCellId').agg(
+        arrivals=('supi', 'size'),
+        ues=('supi', 'nunique'),
+        mean_dwell_minutes=('dwell_minutes', 'mean'),
+        median_dwell_minutes=('dwell_minutes', 'median'),
+        max_dwell_minutes=('dwell_minutes', 'max'),
+    ).round(1)
+    return per_cell.sort_values('arrivals', ascending=False, kind='stable').head(limit)
+
+
+def transition_matrix(loc, limit=MAX_ROWS):
+    """ Handover counts from cell (rows) to cell (columns), over the `limit` busiest cells. """
+    df = _dwell(loc).dropna(subset=['prev_cell'])
+    df['prev_cell'] = df['prev_cell'].astype(df['NrCellId'].dtype)
+    counts = df.groupby(['prev_cell', 'NrCellId']).size()
+    if counts.empty:
+        return pd.DataFrame()
+    volume = counts.groupby(level=0).sum().add(counts.groupby(level=1).sum(), fill_value=0)
+    cells = volume.sort_values(ascending=False, kind='stable').index[:limit]
+    counts = counts[counts.index.get_level_values(0).isin(cells) & counts.index.get_level_values(1).isin(cells)]
+    return counts.unstack(fill_value=0)
+
+
+def registration_uptime(reg, limit=MAX_ROWS):
+    """ Per SUPI: registered / deregistered minutes, uptime ratio, registrations and current state. """
+    df = reg.sort_values('timestamp', kind='stable')
+    minutes = df.pivot_table(index='supi', columns='state_desc', values='duration_minutes',
+                             aggfunc='sum', fill_value=0.0, observed=True)
+    per_supi = pd.DataFrame({
+        'active_minutes': minutes.get('active', 0.0),
+        'inactive_minutes': minutes.get('inactive', 0.0),
+    }, index=minutes.index)
+    total = per_supi['active_minutes'] + per_supi['inactive_minutes']
+    per_supi['uptime_ratio'] = (per_supi['active_minutes'] / total.where(total > 0)).round(3)
+    by_supi = df.groupby('supi', observed=True)
+    per_supi['registrations'] = df[df['state_desc'] == 'active'].groupby('supi', observed=True).size() \
+        .reindex(per_supi.index, fill_value=0)
+    per_supi['current_state'] = by_supi['state_desc'].last().reindex(per_supi.index)
+    per_supi[['active_minutes', 'inactive_minutes']] = per_supi[['active_minutes', 'inactive_minutes']].round(1)
+    return per_supi.sort_values('active_minutes', ascending=False, kind='stable').head(limit)
+
+
+def active_hourly(active):
+    """ Peak and time-weighted mean of the active UE count per hour of day (24 rows at most). """
+    if active.empty:
+        return pd.DataFrame(columns=['peak', 'mean', 'samples'])
+    changes = active.sort_values('timestamp')
+    times = changes['timestamp'].values
+    # The count is a step function; sample it on a regular grid so every
+    # hour is weighted by time rather than by the number of changes in it.
+    grid = pd.date_range(changes['timestamp'].iloc[0].ceil(SAMPLE_STEP), changes['timestamp'].iloc[-1], freq=SAMPLE_STEP)
+    if len(grid) == 0:
+        grid = pd.DatetimeIndex(changes['timestamp'].iloc[[-1]])
+    values = changes['active_UEs'].values[np.searchsorted(times, grid.values, side='right') - 1]
+    sampled = pd.DataFrame({'hour': grid.hour, 'active_UEs': values})
+    hourly = sampled.groupby('hour')['active_UEs'].agg(mean='mean', samples='size').round(2)
+    # Peaks come from the changes themselves so short spikes between grid points count.
+    peak = changes.groupby(changes['timestamp'].dt.hour.rename('hour'))['active_UEs'].max()
+    hourly = hourly.join(peak.rename('peak'), how='outer')
+    hourly['samples'] = hourly['samples'].fillna(0).astype('int64')
+    return hourly[['peak', 'mean', 'samples']]
+
+
+def visit_duration_stats(dest):
+    """ Visit duration statistics per location_type. """
+    stats = dest.groupby('location_type')['duration'].agg(
+        visits='size', mean='mean', median='median', max='max',
+        p90=lambda duration: duration.quantile(0.9),
+    )
+    stats['ues'] = dest.groupby('location_type')['supi'].nunique()
+    return stats.round(1)
+
+
+# aggregate name -> (metric it is computed from, function)
+AGGREGATES = {
+    'handover_counts': ('UE_location_report', handover_counts),
+    'cell_dwell': ('UE_location_report', cell_dwell),
+    'transition_matrix': ('UE_location_report', transition_matrix),
+    'registration_uptime': ('amf_ue_registration_state', registration_uptime),
+    'active_hourly': ('active_UEs', active_hourly),
+    'visit_duration_stats': ('ue_destination_visits_total', visit_duration_stats),
+}
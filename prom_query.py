@@ -1,14 +1,42 @@
 # prometheus_query.py
 
 import ast
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from datetime import datetime, timedelta
+import math
 import os
+import re
+import threading
+import numpy as np
 import pandas as pd
-import requests
-from prometheus_api_client import PrometheusConnect
 
-PROMETHEUS_URL = "http://localhost:9090"  # or wherever your Prometheus is hosted
-prom = PrometheusConnect(url=PROMETHEUS_URL, disable_ssl=True)
+# Response decoding is shared with the analytics module
+import pythonmodule_path  # noqa: F401
+from prom_decode import as_compact_int, as_supi, labels_frame, matrix_frame, parse_times
+from prom_analytics import AGGREGATES
+from event_store import get_store
+from http_client import prometheus_get
+from rollups import NS, bucket_width, step_buckets, tier_for
+
+# Prometheus is reached through the shared client (http_client.py): pooled
+# keep-alive connections, timeouts, retries and a circuit breaker; the URL
+# comes from NWDAF_PROMETHEUS_URL (default http://localhost:9090).
+#
+# Range queries over long windows are split into step-aligned chunks that stay
+# well below Prometheus' 11,000 points-per-series limit and are fetched
+# concurrently over that client's connection pool.
+CHUNK_POINTS = int(os.getenv('PROM_CHUNK_POINTS', '2000'))
+MAX_WORKERS = int(os.getenv('PROM_MAX_WORKERS', '4'))
+# UE_location_report carries each event in its labels, so the series endpoint
+# (labels only, no sample values) is enough to rebuild the events.
+LOCATION_LABELS_ONLY = os.getenv('PROM_LOCATION_LABELS_ONLY', '1') == '1'
+# 'store' answers from the local event store (pythonmodule/event_store.py,
+# filled by its ingestion daemon) with indexed time / SUPI lookups.
+EVENT_SOURCE = os.getenv('PROM_EVENT_SOURCE', 'prometheus')
+# ue_destination_visits_total writes its `timestamp` label in the UE host's
+# local time, this many hours ahead of UTC (the same +4h the frames display)
+VISIT_LOCAL_TIME = pd.Timedelta(hours=4)
 
 def extract_metric_name(promql):
     # List of valid metric names
@@ -28,14 +56,76 @@ def extract_metric_name(promql):
     # If no valid metric found
     raise ValueError(f"No valid metric name found in query: {promql}. Valid metrics are: {', '.join(valid_metrics)}")
 
-def query_prometheus(promql) -> list:
+# Default window when the caller gives no start / relative range
+DEFAULT_START = datetime(2025, 3, 3, 8, 30, 45)
+# Labels each metric can be filtered on server-side
+FILTER_LABELS = {
+    'UE_location_report': {'supi', 'cell'},
+    'ue_destination_visits_total': {'supi'},
+    'amf_ue_registration_state': {'supi'},
+    'active_UEs': set(),
+}
+RELATIVE_UNITS = {'s': 'seconds', 'sec': 'seconds', 'second': 'seconds',
+                  'm': 'minutes', 'min': 'minutes', 'minute': 'minutes',
+                  'h': 'hours', 'hr': 'hours', 'hour': 'hours',
+                  'd': 'days', 'day': 'days', 'w': 'weeks', 'week': 'weeks'}
+
+def parse_relative(last):
+    """ '2h', 'last 30 minutes', '1 day' -> timedelta """
+    match = re.fullmatch(r'(?:last\s*)?(\d+(?:\.\d+)?)\s*([a-z]+)', str(last).strip().lower())
+    unit = match and (RELATIVE_UNITS.get(match.group(2)) or RELATIVE_UNITS.get(match.group(2).rstrip('s')))
+    if not unit:
+        raise ValueError(f"Cannot parse relative range '{last}', expected e.g. '30m', '2h', 'last 3 days'")
+    return timedelta(**{unit: float(match.group(1))})
+
+def resolve_window(start=None, end=None, last=None):
+    """ Query bounds from absolute start/end (ISO strings or datetimes) or a relative `last` range. """
+    end_time = pd.Timestamp(end).to_pydatetime() if end else datetime.now()
+    if last:
+        start_time = end_time - parse_relative(last)
+    elif start:
+        start_time = pd.Timestamp(start).to_pydatetime()
+    else:
+        start_time = DEFAULT_START
+    if start_time >= end_time:
+        raise ValueError(f"Empty time window: start {start_time} is not before end {end_time}")
+    return start_time, end_time
+
+def label_selector(metric, supi=None, cell=None):
+    """
+    PromQL label matchers for the SUPI / cell filters the metric supports,
+    e.g. '{supi=~"(imsi-)?208930000000004",NrCellId=~"0*40"}'. A list of
+    SUPIs becomes an alternation; SUPIs match with or without 'imsi-'.
+    """
+    matchers = []
+    if supi and 'supi' in FILTER_LABELS[metric]:
+        supis = [str(s).strip().replace('imsi-', '', 1) for s in (supi if isinstance(supi, (list, tuple)) else [supi])]
+        if not all(s.isdigit() for s in supis):
+            raise ValueError(f"Invalid SUPI filter: {supi}")
+        matchers.append('supi=~"(imsi-)?(%s)"' % '|'.join(supis))
+    if cell is not None and cell != '' and 'cell' in FILTER_LABELS[metric]:
+        cells = [int(c) for c in (cell if isinstance(cell, (list, tuple)) else [cell])]
+        matchers.append('NrCellId=~"0*(%s)"' % '|'.join(map(str, cells)))
+    return '{' + ','.join(matchers) + '}' if matchers else ''
+
+def query_prometheus(promql, aggregate=None, start=None, end=None, last=None, supi=None, cell=None,
+                     resolution=None) -> list:
     """
     Query Prometheus with a PromQL query string (range query) 
     and return a list of records with the same structure as before.
     
     :param query: A valid PromQL query for range queries.
-    :param start_time: The datetime object for the start of the query range.
-    :param end_time:   The datetime object for the end of the query range.
+    :param aggregate: Optional name of an aggregate in prom_analytics.AGGREGATES
+                      (e.g. 'handover_counts'); the compact aggregate table is
+                      returned instead of the raw frame, and its metric is used.
+    :param start, end: Optional window bounds ('2025-03-04 10:00'); end defaults to now.
+    :param last:       Optional relative window ending at `end` ('2h', 'last 30m'); overrides start.
+    :param supi, cell: Optional SUPI(s) / NrCellId(s). They become label matchers of
+                       the Prometheus query, so only the matching series are fetched.
+    :param resolution: Optional bucket size ('1h', '1d') for 'active_UEs' and
+                       'amf_ue_registration_state'; per-bucket min/max/mean/last
+                       (uptime for registration) from the coarsest rollup tier
+                       that fits are returned instead of every change.
     :return: A list of dictionaries, each containing 'time', 'NrCellId', 'supi', and 'tac'.
     """
     # queryProm = ast.literal_eval(promql)
@@ -44,21 +134,32 @@ def query_prometheus(promql) -> list:
     query = extract_metric_name(promql)#queryProm['query']
     print(query)
 
-    
-    end_time= datetime.now()
-    start_time= datetime(2025, 3, 3, 8, 30, 45)
+    start_time, end_time = resolve_window(start, end, last)
     # end_time= datetime(2025, 1, 24, 11, 30, 45)
     # prom = PrometheusConnect(url=PROMETHEUS_URL, disable_ssl=True)
 
+    if aggregate:
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate '{aggregate}', expected one of: {', '.join(AGGREGATES)}")
+        query, summarize = AGGREGATES[aggregate]
+    # only the filters the metric has labels for
+    filters = {name: value for name, value in (('supi', supi), ('cell', cell))
+               if value not in (None, '') and name in FILTER_LABELS[query]}
+
+    if aggregate:
+        return summarize(FRAMES[query](start_time, end_time, **filters)).to_json(orient='index', date_format='iso')
+
+    if resolution and query in ROLLUPS and tier_for(resolution):
+        return _to_json(ROLLUPS[query](start_time, end_time, resolution, **filters), 'timestamp')
 
     if query == 'UE_location_report':
-        return get_df_location(start_time, end_time)
+        return get_df_location(start_time, end_time, **filters)
     elif query == 'active_UEs':
         return get_df_active(start_time, end_time)
     elif query == 'amf_ue_registration_state':
-        return get_reg(start_time, end_time)
+        return get_reg(start_time, end_time, **filters)
     elif query == 'ue_destination_visits_total':
-        return get_df_destination(start_time, end_time)
+        return get_df_destination(start_time, end_time, **filters)
 
 
 
@@ -150,36 +251,204 @@ def query_prometheus(promql) -> list:
 
 
 
-def get_df_location(start_time=None, end_time=None):
-    # Query Prometheus
-    query='UE_location_report'
-    metric_data = prom.custom_query_range(
-        query=query,
+def step_seconds(step):
+    """ '30s', '5m', '1h', '1d' -> seconds """
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    return float(step[:-1]) * units[step[-1]] if step[-1] in units else float(step)
+
+def split_range(start, end, step, chunk_points=CHUNK_POINTS):
+    """
+    Split [start, end] (epoch seconds) into sub-ranges of at most `chunk_points`
+    evaluation points. Bounds are aligned to multiples of `step`, so the chunks
+    evaluate exactly the timestamps one aligned query would, without overlap.
+    """
+    first = math.ceil(start / step) * step
+    span = (chunk_points - 1) * step
+    chunks = []
+    t = first
+    while t <= end:
+        chunks.append((t, min(t + span, end)))
+        t += chunk_points * step
+    return chunks
+
+def _query_range_chunk(query, start, end, step):
+    return prometheus_get('/api/v1/query_range', {'query': query, 'start': start, 'end': end, 'step': step})['result']
+
+def range_query(query, start_time, end_time, step='5m', chunk_points=CHUNK_POINTS, max_workers=MAX_WORKERS):
+    """
+    Drop-in replacement for prom.custom_query_range: same matrix result
+    (list of {'metric', 'values'}), fetched as concurrent aligned chunks and
+    merged per series in time order.
+    """
+    seconds = step_seconds(step)
+    chunks = split_range(_epoch(start_time), _epoch(end_time), seconds, chunk_points)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as pool:
+        results = list(pool.map(lambda c: _query_range_chunk(query, c[0], c[1], seconds), chunks))
+
+    merged = {}
+    for result in results:      # chunks are in time order
+        for series in result:
+            key = tuple(sorted(series['metric'].items()))
+            merged.setdefault(key, {'metric': series['metric'], 'values': []})['values'].extend(series['values'])
+    return list(merged.values())
+
+def series_query(match, start_time, end_time):
+    """ Label sets of all series matching `match` with samples in the window, without their values. """
+    return prometheus_get('/api/v1/series', {'match[]': match, 'start': _epoch(start_time), 'end': _epoch(end_time)})
+
+
+# Per-metric cache of raw samples already pulled from Prometheus. A call only
+# requests the parts of [start_time, end_time] that are not cached yet (plus a
+# small overlap for late samples), then merges and deduplicates, so query cost
+# grows with new data instead of with the whole history.
+# Tool calls run concurrently (LLM.py), so each cache entry's read-merge-write
+# runs under a per-name lock; different metrics still fetch in parallel.
+CACHE_OVERLAP = timedelta(minutes=10)
+STEP = '5m'
+_cache = {}
+_cache_locks = {}
+_cache_locks_lock = threading.Lock()
+
+def _epoch(t):
+    return t.timestamp() if isinstance(t, datetime) else float(t)
+
+def cached_range(name, fetch_raw, start_time, end_time, keys):
+    """
+    Return the raw frame of `fetch_raw(start, end)` for [start_time, end_time].
+    Raw frames carry a 'sample_time' column (epoch seconds) that is used to
+    trim the cached frame to the requested window; rows sharing `keys` are
+    the same sample/series and the most recent fetch wins.
+    """
+    start, end = _epoch(start_time), _epoch(end_time)
+    with _cache_lock(name):
+        entry = _cache.get(name)
+        if entry is None:
+            entry = {'start': start, 'end': end, 'frame': fetch_raw(start_time, end_time)}
+        else:
+            parts = [entry['frame']]
+            if start < entry['start']:
+                parts.append(fetch_raw(start_time, datetime.fromtimestamp(entry['start']) + CACHE_OVERLAP))
+            if end > entry['end']:
+                parts.append(fetch_raw(datetime.fromtimestamp(entry['end']) - CACHE_OVERLAP, end_time))
+            if len(parts) > 1:
+                frame = pd.concat([p for p in parts if not p.empty] or parts[:1], ignore_index=True)
+                frame = frame.sort_values('sample_time', kind='stable').drop_duplicates(keys, keep='last')
+                entry = {'start': min(start, entry['start']), 'end': max(end, entry['end']), 'frame': frame}
+        _cache[name] = entry
+    frame = entry['frame']
+    return frame[(frame['sample_time'] >= start) & (frame['sample_time'] <= end)].reset_index(drop=True)
+
+def _cache_lock(name):
+    with _cache_locks_lock:
+        return _cache_locks.setdefault(name, threading.Lock())
+
+def clear_cache(name=None):
+    for key in (list(_cache) if name is None else [name]):
+        with _cache_lock(key):
+            _cache.pop(key, None)
+
+
+def _event_seconds(times):
+    """ Parsed (naive UTC) event times -> epoch seconds """
+    return (times - pd.Timestamp(0)) / pd.Timedelta(seconds=1)
+
+def _fetch_location_raw(start_time, end_time, selector=''):
+    metric_data = range_query(
+        query='UE_location_report' + selector,
         start_time=start_time,
         end_time=end_time,
-        step='5m'  # 1 minute intervals, adjust as needed
+        step=STEP
     )
-    
-    # Process the data into a list of dictionaries
-    records = []
-    for entry in metric_data:
-        metric = entry['metric']
-        # Extract only the desired labels
-        record = {
-            'time': metric['time'],
-            'NrCellId': metric['NrCellId'],
-            'supi': metric['supi'],
-            'tac': metric['tac']
-            
-        }
-        records.append(record)
-    
-    # Convert to DataFrame
-    df = pd.DataFrame(records)
+    # Every event is its own series and stays exported after the event, so the
+    # cache is trimmed by the event time in its labels, not by scrape times
+    df = labels_frame([entry['metric'] for entry in metric_data], ['time', 'NrCellId', 'supi', 'tac'])
+    df['sample_time'] = _event_seconds(parse_times(df['time'])).astype(float)
+    return df
+
+def _fetch_location_labels(start_time, end_time, selector=''):
+    # Same records as _fetch_location_raw, from the series endpoint. There are
+    # no sample timestamps, so the event time stands in for the time the
+    # series was seen.
+    labels = series_query('UE_location_report' + selector, start_time, end_time)
+    df = labels_frame(labels, ['time', 'NrCellId', 'supi', 'tac'])
+    df['sample_time'] = _event_seconds(parse_times(df['time'])).astype(float)
+    return df
+
+def _fetch_destination_raw(start_time, end_time, selector=''):
+    metric_data = range_query(
+        query='ue_destination_visits_total' + selector,
+        start_time=start_time,
+        end_time=end_time,
+        step=STEP
+    )
+    df = labels_frame([entry['metric'] for entry in metric_data],
+                      ['timestamp', 'supi', 'location_type', 'duration', 'time_of_day'])
+    df = df.rename(columns={'timestamp': 'time'})
+    df['sample_time'] = _event_seconds(parse_times(df['time']) - VISIT_LOCAL_TIME).astype(float)
+    return df
+
+def _fetch_active_raw(start_time, end_time):
+    result = range_query(
+        query='active_UEs{state="current"}',
+        start_time=start_time,
+        end_time=end_time,
+        step=STEP
+    )
+    return matrix_frame((result or [])[:1], value_name='active_UEs')
+
+def _fetch_reg_raw(start_time, end_time, selector=''):
+    # filter for metrics with SUPI label
+    result = range_query(
+        query='amf_ue_registration_state' + (selector or '{supi=~".+"}'),
+        start_time=start_time,
+        end_time=end_time,
+        step=STEP
+    )
+    return matrix_frame(result, value_name='state', label='supi')
+
+def within_window(df, start_time=None, end_time=None, time_col='time', offset=pd.Timedelta(0)):
+    """
+    Rows whose event time lies in [start_time, end_time]. Event series stay
+    exported long after the event, so the time a series was scraped says
+    nothing about when the event happened; the window applies to the event.
+    `offset` is how far the written times are ahead of UTC.
+    """
+    seconds = _event_seconds(df[time_col] - offset)
+    keep = pd.Series(True, index=df.index)
+    if start_time is not None:
+        keep &= seconds >= _epoch(start_time)
+    if end_time is not None:
+        keep &= seconds <= _epoch(end_time)
+    return df[keep]
+
+def _to_json(df, time_col):
+    df = df.copy()
+    df[time_col] = df[time_col].dt.strftime('%Y-%m-%d %H:%M:%S')
+    return df.to_json()
 
-    # Convert time string to datetime
-    # Remove 'UTC' and trailing timezone info for clean parsing
-    df['time'] = df['time'].apply(lambda x: pd.to_datetime(x.split('+')[0].strip()))
+def location_frame(start_time=None, end_time=None, labels_only=LOCATION_LABELS_ONLY, supi=None, cell=None):
+    """ Handover events (time, NrCellId, supi, tac) with typed columns, sorted by time. """
+    if EVENT_SOURCE == 'store':
+        df = get_store().location(start_time, end_time, supi=supi, cell=cell)
+    else:
+        selector = label_selector('UE_location_report', supi, cell)
+        if labels_only:
+            df = cached_range('UE_location_report/series' + selector, partial(_fetch_location_labels, selector=selector),
+                              start_time, end_time, keys=['time', 'NrCellId', 'supi', 'tac'])
+        else:
+            df = cached_range('UE_location_report' + selector, partial(_fetch_location_raw, selector=selector),
+                              start_time, end_time, keys=['time', 'NrCellId', 'supi', 'tac'])
+        if len(df):
+            df = df.drop(columns='sample_time')
+            # Typed columns: datetime64 times, categorical SUPIs, integer cell / TA ids
+            df['time'] = parse_times(df['time'])
+            df['supi'] = as_supi(df['supi'])
+            df['NrCellId'] = as_compact_int(df['NrCellId'])
+            df['tac'] = as_compact_int(df['tac'])
+            df = within_window(df, start_time, end_time)
+    if df.empty:
+        return pd.DataFrame({'time': pd.Series(dtype='datetime64[ns]'), 'NrCellId': pd.Series(dtype='int32'),
+                             'supi': pd.Series(dtype='category'), 'tac': pd.Series(dtype='int32')})
     # Sort by 'supi' and 'time'
     
     df = df.sort_values(by=['supi', 'time'])
@@ -195,42 +464,30 @@ def get_df_location(start_time=None, end_time=None):
     # Sort by time
     df = df.sort_values('time')
     df['time'] = df['time'] + pd.Timedelta(hours=4)
-    df['supi'] = df['supi'].str.extract(r'imsi-(\d+)').astype(str)
-    df['time'] = df['time'].dt.strftime('%Y-%m-%d %H:%M:%S')
     # Reset index after sorting
-    df = df.reset_index(drop=True)
-    
-    return df.to_json()
-def get_df_destination(start_time=None, end_time=None):
-    # Query Prometheus
-    metric_data = prom.custom_query_range(
-        query='ue_destination_visits_total',
-        start_time=start_time,
-        end_time=end_time,
-        step='5m'  # 1 minute intervals, adjust as needed
-    )
-    
-    # Process the data into a list of dictionaries
-    records = []
-    for entry in metric_data:
-        metric = entry['metric']
-        # Extract only the desired labels
-        record = {
-            'time': metric['timestamp'],
-            'supi': metric['supi'],
-            'location_type': metric['location_type'],
-            'duration': metric['duration'],
-            'time_of_day': metric['time_of_day']
-        }
-        records.append(record)
-    
-    # Convert to DataFrame
-    df = pd.DataFrame(records)
+    return df.reset_index(drop=True)
 
-    # Convert time string to datetime
-    # Remove 'UTC' and trailing timezone info for clean parsing
-    df['time'] = df['time'].apply(lambda x: pd.to_datetime(x.split('+')[0].strip()))
+def get_df_location(start_time=None, end_time=None, labels_only=LOCATION_LABELS_ONLY, supi=None, cell=None):
+    return _to_json(location_frame(start_time, end_time, labels_only, supi, cell), 'time')
 
+def destination_frame(start_time=None, end_time=None, supi=None):
+    """ Destination visits (time, supi, location_type, duration, time_of_day), sorted by time. """
+    if EVENT_SOURCE == 'store':
+        df = get_store().destination(start_time, end_time, supi=supi)
+    else:
+        selector = label_selector('ue_destination_visits_total', supi)
+        df = cached_range('ue_destination_visits_total' + selector, partial(_fetch_destination_raw, selector=selector),
+                          start_time, end_time, keys=['time', 'supi', 'location_type', 'duration', 'time_of_day'])
+        if len(df):
+            df = df.drop(columns='sample_time')
+            df['time'] = parse_times(df['time'])
+            df['supi'] = as_supi(df['supi'], strip_prefix=False)
+            df['duration'] = pd.to_numeric(df['duration'], errors='coerce')
+            df = within_window(df, start_time, end_time, offset=VISIT_LOCAL_TIME)
+    if df.empty:
+        return pd.DataFrame({'time': pd.Series(dtype='datetime64[ns]'), 'supi': pd.Series(dtype='category'),
+                             'location_type': pd.Series(dtype=object), 'duration': pd.Series(dtype=float),
+                             'time_of_day': pd.Series(dtype=object)})
 
     df = df.sort_values(by=['supi', 'time'])
     # Drop consecutive rows with the same 'supi' and 'NrCellId'
@@ -241,109 +498,154 @@ def get_df_destination(start_time=None, end_time=None):
     
     # Sort by time
     df = df.sort_values('time')
-    df['time'] = df['time'].dt.strftime('%Y-%m-%d %H:%M:%S')
     # Reset index after sorting
-    df = df.reset_index(drop=True)
+    return df.reset_index(drop=True)
+
+def get_df_destination(start_time=None, end_time=None, supi=None):
+    return _to_json(destination_frame(start_time, end_time, supi), 'time')
+
+
+def active_frame(start_time=None, end_time=None):
+    """ Changes of the active UE count (timestamp, active_UEs, duration until the next change). """
+    if EVENT_SOURCE == 'store':
+        df = get_store().active(start_time, end_time)
+    else:
+        df = cached_range('active_UEs', _fetch_active_raw, start_time, end_time, keys=['sample_time'])
+    if df.empty:
+        return pd.DataFrame({'timestamp': pd.Series(dtype='datetime64[ns]'), 'active_UEs': pd.Series(dtype='int64'),
+                             'duration': pd.Series(dtype='timedelta64[ns]')})
+
+    # Convert timestamp to datetime
+    df['timestamp'] = pd.to_datetime(df['sample_time'], unit='s')
+    df = df[['timestamp', 'active_UEs']]
     
-    return df.to_json()
+    # Counts come back as float64; keep them integral like before
+    df['active_UEs'] = pd.to_numeric(df['active_UEs'], downcast='integer')
+
+    # Remove duplicate consecutive values
+    df = df[df['active_UEs'].shift() != df['active_UEs']]
+    df['duration'] = (df['timestamp'].shift(-1) - df['timestamp']).fillna(pd.Timedelta(seconds=0))
 
+    df['timestamp'] = df['timestamp'] + pd.Timedelta(hours=4)
+    # Reset index after sorting
+    return df.reset_index(drop=True)
 
 def get_df_active(start_time=None, end_time=None):
-    
-    
-    # Query Prometheus
-    query = 'active_UEs{state="current"}'
-    result = prom.custom_query_range(
-        query=query,
-        start_time=start_time,
-        end_time=end_time,
-        step='5m'  # 30 minute intervals, adjust as needed
-    )
-    
-    # Convert to DataFrame
-    if result and len(result) > 0:
-        # Extract timestamps and values
-        data = result[0]['values']  # values is a list of [timestamp, value] pairs
-        df = pd.DataFrame(data, columns=['timestamp', 'active_UEs'])
-        
-        # Convert timestamp to datetime
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
-        
-        # Convert active_UEs to numeric
-        df['active_UEs'] = pd.to_numeric(df['active_UEs'])
-
-        # Remove duplicate consecutive values
-        df = df[df['active_UEs'].shift() != df['active_UEs']]
-        df['duration'] = (df['timestamp'].shift(-1) - df['timestamp']).fillna(pd.Timedelta(seconds=0))
-
-        df['timestamp'] = df['timestamp'] + pd.Timedelta(hours=4)
-        df['timestamp'] = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        # Reset index after sorting
-        df = df.reset_index(drop=True)
-        return df.to_json()
-    else:
+    df = active_frame(start_time, end_time)
+    if df.empty:
         return pd.DataFrame(columns=['timestamp', 'active_UEs']).to_json()
+    return _to_json(df, 'timestamp')
 
-def get_reg(start_time=None, end_time=None):
+def reg_frame(start_time=None, end_time=None, supi=None):
+    """ Registration state changes (timestamp, supi, state_desc, duration_minutes), sorted by time. """
+    if EVENT_SOURCE == 'store':
+        raw = get_store().registration(start_time, end_time, supi=supi)
+    else:
+        selector = label_selector('amf_ue_registration_state', supi)
+        raw = cached_range('amf_ue_registration_state' + selector, partial(_fetch_reg_raw, selector=selector),
+                           start_time, end_time, keys=['supi', 'sample_time'])
+    if raw.empty:
+        return pd.DataFrame({'timestamp': pd.Series(dtype='datetime64[ns]'), 'supi': pd.Series(dtype='category'),
+                             'state_desc': pd.Series(dtype=object), 'duration_minutes': pd.Series(dtype=float)})
+
+    raw = raw.copy()
+    raw['supi'] = as_supi(raw['supi'], strip_prefix=False)
+    raw = raw.sort_values(['supi', 'sample_time'], kind='stable')
+    # Keep only state changes, per SUPI, in one pass over all series
+    final_df = raw[(raw['supi'] != raw['supi'].shift()) | (raw['state'] != raw['state'].shift())].copy()
+    final_df['timestamp'] = pd.to_datetime(final_df['sample_time'], unit='s')
+
+    # Sort by timestamp
+    final_df = final_df.sort_values('timestamp', kind='stable')
+
+    # Add state description
+    final_df['state_desc'] = final_df['state'].map({1: 'active', 0: 'inactive'})
     
-    # Query Prometheus - filter for metrics with SUPI label
-    query = 'amf_ue_registration_state{supi=~".+"}'
-    result = prom.custom_query_range(
-        query=query,
-        start_time=start_time,
-        end_time=end_time,
-        step='5m' # 5 minute intervals, adjust as needed
+    # Reorder columns
+    final_df = final_df[['timestamp', 'supi', 'state', 'state_desc']]#, 'duration_minutes']]
+    final_df = final_df.drop('state', axis=1)
+    final_df = final_df.sort_values(by=['supi', 'timestamp'])
+
+    # Calculate duration in minutes
+    final_df['duration_minutes'] = (
+        final_df.groupby('supi', observed=True)['timestamp'].diff().shift(-1).dt.total_seconds() / 60
     )
-    
-    # Convert to DataFrame
-    dataframes = []
-    
-    if result:
-        for metric in result:
-            # Extract SUPI from metric metadata
-            supi = metric['metric'].get('supi', 'unknown')
-            
-            # Create DataFrame for this SUPI
-            df = pd.DataFrame(metric['values'], columns=['timestamp', 'state'])
-            df['supi'] = supi
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
-            df['state'] = pd.to_numeric(df['state'])
-            
-            # Keep only state changes
-            df = df[df['state'].shift() != df['state']]
-            
-            dataframes.append(df)
-    
-    if dataframes:
-        # Combine all SUPIs into one DataFrame
-        final_df = pd.concat(dataframes, ignore_index=True)
-        
-        # Sort by timestamp
-        final_df = final_df.sort_values('timestamp')
-        
-      
-        
-        # Add state description
-        final_df['state_desc'] = final_df['state'].map({1: 'active', 0: 'inactive'})
-        
-        # Reorder columns
-        final_df = final_df[['timestamp', 'supi', 'state', 'state_desc']]#, 'duration_minutes']]
-        final_df = final_df.drop('state', axis=1)
-        final_df = final_df.sort_values(by=['supi', 'timestamp'])
-
-        # Calculate duration in minutes
-        final_df['duration_minutes'] = (
-            final_df.groupby('supi')['timestamp'].diff().shift(-1).dt.total_seconds() / 60
-        )
-        final_df = final_df.sort_values(by='timestamp')
-        final_df['timestamp'] = final_df['timestamp'] + pd.Timedelta(hours=4)
-        final_df['timestamp'] = final_df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        # final_df['timestamp'] = final_df['timestamp'].astype(str)
-        # Reset index after sorting
-        final_df = final_df.reset_index(drop=True)        
-        return final_df.to_json()
-    else:
+    final_df = final_df.sort_values(by='timestamp')
+    final_df['timestamp'] = final_df['timestamp'] + pd.Timedelta(hours=4)
+    # Reset index after sorting
+    return final_df.reset_index(drop=True)
+
+def get_reg(start_time=None, end_time=None, supi=None):
+    df = reg_frame(start_time, end_time, supi)
+    if df.empty:
         return pd.DataFrame(columns=['timestamp', 'supi', 'state', 'state_desc', 'duration_minutes']).to_json()
+    return _to_json(df, 'timestamp')
+
+
+def _buckets(times, values, start_time, end_time, resolution):
+    """ Rollup buckets computed here from a full-resolution frame (when there is no event store). """
+    times_ns = np.round(times.values * NS).astype('int64')
+    return step_buckets(times_ns, values, int(_epoch(start_time) * NS), int(_epoch(end_time) * NS),
+                        bucket_width(resolution))
+
+def active_rollup_frame(start_time, end_time, resolution):
+    """
+    Active UE count per `resolution` bucket: timestamp (bucket start), min,
+    max, time-weighted mean and last value. Read from the coarsest of the
+    store's 5m/1h/1d tiers that fits when PROM_EVENT_SOURCE=store.
+    """
+    if EVENT_SOURCE == 'store':
+        df = get_store().rollups.read('active_rollup', resolution, int(_epoch(start_time) * NS),
+                                      int(_epoch(end_time) * NS))
+    else:
+        raw = cached_range('active_UEs', _fetch_active_raw, start_time, end_time, keys=['sample_time'])
+        df = _buckets(raw['sample_time'], raw['active_UEs'], start_time, end_time, resolution)
+        df.insert(0, 'time', pd.to_datetime(df.pop('bucket_ns'), unit='ns'))
+    df = df.rename(columns={'time': 'timestamp'}).drop(columns='seconds')
+    df['timestamp'] = df['timestamp'] + pd.Timedelta(hours=4)
+    df['mean'] = df['mean'].round(2)
+    return df.reset_index(drop=True)
+
+def reg_rollup_frame(start_time, end_time, resolution, supi=None):
+    """
+    Registration uptime per SUPI and `resolution` bucket: timestamp, supi,
+    uptime_ratio, registered_minutes and the state at the end of the bucket.
+    """
+    if EVENT_SOURCE == 'store':
+        df = get_store().rollups.read('registration_rollup', resolution, int(_epoch(start_time) * NS),
+                                      int(_epoch(end_time) * NS), supi=supi)
+        df['supi'] = 'imsi-' + df['supi']
+    else:
+        selector = label_selector('amf_ue_registration_state', supi)
+        raw = cached_range('amf_ue_registration_state' + selector, partial(_fetch_reg_raw, selector=selector),
+                           start_time, end_time, keys=['supi', 'sample_time'])
+        parts = [_buckets(group['sample_time'], group['state'], start_time, end_time, resolution).assign(supi=name)
+                 for name, group in raw.sort_values('sample_time').groupby('supi', observed=True)]
+        df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=['bucket_ns', 'seconds', 'mean', 'last', 'supi'])
+        df.insert(0, 'time', pd.to_datetime(df.pop('bucket_ns'), unit='ns'))
+    df = pd.DataFrame({
+        'timestamp': df['time'] + pd.Timedelta(hours=4),
+        'supi': as_supi(df['supi'], strip_prefix=False),
+        'uptime_ratio': df['mean'].astype(float).round(3),
+        'registered_minutes': (df['mean'] * df['seconds'] / 60).astype(float).round(1),
+        'state_desc': df['last'].map({1: 'active', 0: 'inactive'}),
+    })
+    return df.sort_values(['timestamp', 'supi'], kind='stable').reset_index(drop=True)
+
+
+# metric name -> typed frame builder, used for the aggregates
+FRAMES = {
+    'UE_location_report': location_frame,
+    'active_UEs': active_frame,
+    'amf_ue_registration_state': reg_frame,
+    'ue_destination_visits_total': destination_frame,
+}
+
+# metric name -> rollup frame builder, used for `resolution`
+ROLLUPS = {
+    'active_UEs': active_rollup_frame,
+    'amf_ue_registration_state': reg_rollup_frame,
+}
 
 
 if __name__ == "__main__":
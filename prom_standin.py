@@ -0,0 +1,351 @@
+# prom_standin.py
+#
+# Local stand-in for the Prometheus HTTP API, backed by the `core dataset`
+# CSVs, so prom_query.py / AnLF.py can be benchmarked and regression-tested
+# without the free5gc + NWDAF + Prometheus stack.
+#
+#   python3 prom_standin.py                                   # newest period, all data in the past
+#   python3 prom_standin.py --dataset "core dataset/03 Feb 2025 - 18 Feb 2025"
+#   python3 prom_standin.py --dataset "core dataset/df_2484.csv"  # location-only trace
+#   python3 prom_standin.py --start "2025-03-01 08:00" --speed 60  # replay, 1 wall second = 1 data minute
+#
+# Implements GET/POST /api/v1/query_range, /api/v1/query, /api/v1/series and
+# /api/v1/label/__name__/values for plain selectors (metric{label="v",
+# label=~"re", label!="v", label!~"re"}), which is all the clients use.
+#
+# The series are rebuilt the way the NWDAF exporter exposes them:
+#   UE_location_report{time,NrCellId,supi,tac}              1 from the event on, one series per event
+#   ue_destination_visits_total{timestamp,supi,location_type,duration,time_of_day}   likewise
+#   amf_ue_registration_state{supi}                        1/0 step function per SUPI
+#   active_UEs{state="current"}                            step function
+# The CSVs were exported after the analytics' +4h display shift; it is taken
+# off again so the clients' own shift reproduces the CSV timestamps.
+#
+# Clock: the data time that corresponds to "now" at startup is --start
+# (default: just after the end of the dataset) and it advances --speed times
+# faster than the wall clock. Request times are wall-clock epochs and are
+# mapped onto the data, sample timestamps and the event-time labels (`time`,
+# `timestamp`) are mapped back, and nothing later than the current data time
+# is visible.
+
+import argparse
+import json
+import os
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'core dataset', '21 Feb 2025 - 14 Apr 2025')
+DISPLAY_SHIFT = pd.Timedelta(hours=4)
+MAX_POINTS = 11000          # Prometheus' per-series resolution limit
+
+
+def _epochs(times):
+    return ((pd.to_datetime(times) - pd.Timestamp(0)) / pd.Timedelta(seconds=1)).values
+
+
+def _label_time(times):
+    """ Event times as the exporter writes them: '2025-02-21 08:07:28.783806274 +0000 UTC' """
+    times = pd.to_datetime(times)
+    fraction = (times.dt.microsecond * 1000 + times.dt.nanosecond).map('{:09d}'.format)
+    return times.dt.strftime('%Y-%m-%d %H:%M:%S') + '.' + fraction + ' +0000 UTC'
+
+
+def _local_time(times):
+    """ Visit times as the exporter writes them, in local time: '2025-02-21 12:13:17' """
+    return (pd.to_datetime(times) + DISPLAY_SHIFT).dt.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Series:
+    """ A step function: `values[i]` from `times[i]` on (data epochs), absent after `until`. """
+
+    def __init__(self, labels, times, values, until=np.inf):
+        self.labels = labels
+        self.times = np.asarray(times, dtype=float)
+        self.values = np.asarray(values, dtype=float)
+        self.until = until
+
+    def sample(self, grid, now):
+        """ Indices into `grid` where the series exists and the value at each of them. """
+        idx = np.searchsorted(self.times, grid, side='right') - 1
+        present = np.flatnonzero((idx >= 0) & (grid <= min(self.until, now)))
+        return present, self.values[idx[present]]
+
+
+class Dataset:
+    """ All series of one `core dataset` period directory, or of a single df_NNNN.csv location trace. """
+
+    # event metric -> its event-time label and how the exporter writes it
+    EVENT_TIME = {'UE_location_report': ('time', _label_time), 'ue_destination_visits_total': ('timestamp', _local_time)}
+
+    def __init__(self, path=DEFAULT_DATASET, ttl=None):
+        self.path = path
+        self.ttl = ttl
+        self.series = {}
+        if os.path.isdir(path):
+            self._load_location(pd.read_csv(os.path.join(path, 'df_location.csv'), dtype=str))
+            self._load_destination(pd.read_csv(os.path.join(path, 'df_destination.csv'), dtype=str))
+            self._load_registration(pd.read_csv(os.path.join(path, 'df_reg.csv'), dtype=str))
+            self._load_active(pd.read_csv(os.path.join(path, 'df_active.csv'), dtype=str))
+        else:
+            self._load_location(pd.read_csv(path, dtype=str))
+        self.end = max(s.times[-1] for series in self.series.values() for s in series)
+
+    def _events(self, name, labels, starts):
+        until = starts + self.ttl if self.ttl else np.full(len(starts), np.inf)
+        self.series[name] = [Series(dict(labels[i], __name__=name), [starts[i]], [1.0], until[i])
+                             for i in np.argsort(starts, kind='stable')]
+
+    def _load_location(self, df):
+        times = pd.to_datetime(df['time']) - DISPLAY_SHIFT
+        labels = pd.DataFrame({'time': _label_time(times), 'NrCellId': df['NrCellId'],
+                               'supi': 'imsi-' + df['supi'], 'tac': df['tac']})
+        self._events('UE_location_report', labels.to_dict('records'), _epochs(times))
+
+    def _load_destination(self, df):
+        # visit timestamps are written in local time; only the sample time is shifted
+        labels = df.rename(columns={'time': 'timestamp'})[
+            ['timestamp', 'supi', 'location_type', 'duration', 'time_of_day']]
+        self._events('ue_destination_visits_total', labels.to_dict('records'),
+                     _epochs(pd.to_datetime(df['time']) - DISPLAY_SHIFT))
+
+    def _load_registration(self, df):
+        df = df.assign(t=_epochs(pd.to_datetime(df['timestamp']) - DISPLAY_SHIFT),
+                       state=(df['state_desc'] == 'active').astype(float)).sort_values('t', kind='stable')
+        self.series['amf_ue_registration_state'] = [
+            Series({'__name__': 'amf_ue_registration_state', 'supi': supi}, group['t'].values, group['state'].values)
+            for supi, group in df.groupby('supi', sort=True)
+        ]
+
+    def _load_active(self, df):
+        df = df.assign(t=_epochs(pd.to_datetime(df['timestamp']) - DISPLAY_SHIFT)).sort_values('t', kind='stable')
+        self.series['active_UEs'] = [
+            Series({'__name__': 'active_UEs', 'state': 'current'}, df['t'].values, df['active_UEs'].astype(float).values)
+        ]
+
+    SELECTOR = re.compile(r'^\s*([a-zA-Z_:][a-zA-Z0-9_:]*)?\s*(?:\{(.*)\})?\s*$')
+    MATCHER = re.compile(r'\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*(=~|!~|!=|=)\s*"((?:[^"\\]|\\.)*)"\s*(?:,|$)')
+
+    def wall_labels(self, clock):
+        """ {id(series): labels} of the event series, with the event time moved onto `clock`'s wall time. """
+        labels = {}
+        for name, (label, write) in self.EVENT_TIME.items():
+            series = self.series.get(name, [])
+            if series:
+                wall = pd.Series(pd.to_datetime(clock.to_wall([s.times[0] for s in series]), unit='s'))
+                labels.update((id(s), dict(s.labels, **{label: text})) for s, text in zip(series, write(wall)))
+        return labels
+
+    def select(self, expr, labels=None):
+        """ Series matching a plain PromQL selector, on `labels` (wall_labels) where given. """
+        match = self.SELECTOR.match(expr or '')
+        if not match or not (match.group(1) or match.group(2)):
+            raise ValueError(f"unsupported expression: {expr!r} (only plain selectors are served)")
+        name, body = match.group(1), (match.group(2) or '').strip()
+        matchers, pos = [], 0
+        while pos < len(body):
+            m = self.MATCHER.match(body, pos)
+            if not m:
+                raise ValueError(f"cannot parse label matchers in {expr!r}")
+            label, op, value = m.group(1), m.group(2), m.group(3).replace('\\"', '"').replace('\\\\', '\\')
+            matchers.append((label, op, re.compile(value) if '~' in op else value))
+            pos = m.end()
+        if name:
+            matchers.insert(0, ('__name__', '=', name))
+        candidates = self.series.get(name, []) if name else [s for series in self.series.values() for s in series]
+        labels = labels or {}
+        return [s for s in candidates if all(self._matches(labels.get(id(s), s.labels).get(label, ''), op, value)
+                                             for label, op, value in matchers)]
+
+    @staticmethod
+    def _matches(actual, op, value):
+        if op == '=':
+            return actual == value
+        if op == '!=':
+            return actual != value
+        found = value.fullmatch(actual) is not None
+        return found if op == '=~' else not found
+
+
+class Clock:
+    """ Maps wall-clock epochs onto data epochs: data = start + (wall - wall0) * speed. """
+
+    def __init__(self, start, speed=1.0):
+        self.start = start
+        self.speed = speed
+        self.wall0 = time.time()
+
+    def to_data(self, wall):
+        return self.start + (np.asarray(wall, dtype=float) - self.wall0) * self.speed
+
+    def to_wall(self, data):
+        return self.wall0 + (np.asarray(data, dtype=float) - self.start) / self.speed
+
+    def now(self):
+        return float(self.to_data(time.time()))
+
+
+def parse_duration(value):
+    """ Prometheus durations/steps: '300', '30s', '5m', '1h', '1d' -> seconds """
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)(ms|s|m|h|d|w|y)?', str(value).strip())
+    if not match:
+        raise ValueError(f"cannot parse duration {value!r}")
+    unit = {None: 1, 'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800, 'y': 31536000}[match.group(2)]
+    return float(match.group(1)) * unit
+
+
+def parse_time(value, default):
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return pd.Timestamp(value).timestamp()
+
+
+class API:
+    def __init__(self, dataset, clock):
+        self.dataset = dataset
+        self.clock = clock
+        # event-time labels agree with the mapped sample times, as a live exporter's do
+        self.labels = dataset.wall_labels(clock)
+
+    def select(self, expr):
+        return [(series, self.labels.get(id(series), series.labels))
+                for series in self.dataset.select(expr, self.labels)]
+
+    def query_range(self, params):
+        start, end = parse_time(params.get('start'), None), parse_time(params.get('end'), None)
+        if start is None or end is None or 'step' not in params:
+            raise ValueError("query_range needs start, end and step")
+        step = parse_duration(params['step'])
+        if step <= 0 or end < start:
+            raise ValueError("zero or negative query resolution step widths are not accepted")
+        if (end - start) / step > MAX_POINTS:
+            raise ValueError(f"exceeded maximum resolution of {MAX_POINTS:,} points per timeseries. "
+                             "Try decreasing the query resolution (?step=XX)")
+        wall = np.arange(start, end + step / 2, step)
+        grid, now = self.clock.to_data(wall), self.clock.now()
+        stamps = [_format_time(t) for t in wall]
+        result = []
+        for series, labels in self.select(params.get('query')):
+            present, values = series.sample(grid, now)
+            if len(present):
+                text = {v: _format_value(v) for v in set(values.tolist())}
+                result.append({'metric': labels,
+                               'values': [[stamps[i], text[v]] for i, v in zip(present.tolist(), values.tolist())]})
+        return {'resultType': 'matrix', 'result': result}
+
+    def query(self, params):
+        wall = parse_time(params.get('time'), time.time())
+        at, now = float(self.clock.to_data(wall)), self.clock.now()
+        result = []
+        for series, labels in self.select(params.get('query')):
+            present, values = series.sample(np.array([at]), now)
+            if len(present):
+                result.append({'metric': labels, 'value': [_format_time(wall), _format_value(values[0])]})
+        return {'resultType': 'vector', 'result': result}
+
+    def series(self, params):
+        now = self.clock.now()
+        start = float(self.clock.to_data(parse_time(params.get('start'), self.clock.to_wall(0))))
+        end = min(float(self.clock.to_data(parse_time(params.get('end'), time.time()))), now)
+        matches = params.get('match[]') or []
+        if not matches:
+            raise ValueError("no match[] parameter provided")
+        seen, data = set(), []
+        for expr in matches:
+            for series, labels in self.select(expr):
+                if id(series) not in seen and series.times[0] <= end and series.until >= start:
+                    seen.add(id(series))
+                    data.append(labels)
+        return data
+
+    def label_names(self, params):
+        return sorted(self.dataset.series)
+
+
+def _format_time(t):
+    t = round(float(t), 3)
+    return int(t) if t.is_integer() else t
+
+
+def make_handler(api):
+    routes = {
+        '/api/v1/query_range': api.query_range,
+        '/api/v1/query': api.query,
+        '/api/v1/series': api.series,
+        '/api/v1/label/__name__/values': api.label_names,
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _handle(self, params):
+            url = urlparse(self.path)
+            params = {**parse_qs(url.query), **params}
+            params = {k: (v if k == 'match[]' else v[-1]) for k, v in params.items()}
+            route = routes.get(url.path)
+            if route is None:
+                return self._reply(404, {'status': 'error', 'errorType': 'not_found', 'error': url.path})
+            try:
+                self._reply(200, {'status': 'success', 'data': route(params)})
+            except ValueError as e:
+                self._reply(400, {'status': 'error', 'errorType': 'bad_data', 'error': str(e)})
+
+        def _reply(self, status, body):
+            payload = json.dumps(body, separators=(',', ':')).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            self._handle({})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            self._handle(parse_qs(self.rfile.read(length).decode()))
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(dataset=DEFAULT_DATASET, host='127.0.0.1', port=9090, start=None, speed=1.0, ttl=None):
+    """ Build the server; call serve_forever() on it (or run it in a thread for benchmarks). """
+    data = dataset if isinstance(dataset, Dataset) else Dataset(dataset, ttl=ttl)
+    clock = Clock(parse_time(start, None) if start is not None else data.end + 60, speed)
+    return ThreadingHTTPServer((host, port), make_handler(API(data, clock)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve a core dataset period through the Prometheus HTTP API.")
+    parser.add_argument('--dataset', default=DEFAULT_DATASET,
+                        help="period directory with df_*.csv, or a single df_NNNN.csv location trace")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9090)
+    parser.add_argument('--start', help="data time (UTC) that is 'now' at startup; default: end of the dataset")
+    parser.add_argument('--speed', type=float, default=1.0, help="data seconds per wall-clock second")
+    parser.add_argument('--ttl', type=float, help="minutes an event series stays exposed (default: forever)")
+    args = parser.parse_args()
+
+    data = Dataset(args.dataset, ttl=args.ttl and args.ttl * 60)
+    server = serve(data, args.host, args.port, args.start, args.speed)
+    first = min(s.times[0] for series in data.series.values() for s in series)
+    print(f"Serving {args.dataset} ({pd.Timestamp(first, unit='s')} .. {pd.Timestamp(data.end, unit='s')} UTC, "
+          f"{sum(map(len, data.series.values()))} series) on http://{args.host}:{args.port}, speed x{args.speed}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,16 @@
+# pythonmodule_path.py
+#
+# Puts the NWDAF pythonmodule (prom_decode, http_client, event_store, ...)
+# on sys.path for the scripts at the repository root. Import it before any
+# of those modules:
+#
+#   import pythonmodule_path  # noqa: F401
+#   from http_client import get_client
+
+import os
+import sys
+
+PYTHONMODULE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mnc_NWDAF-main', 'NWDAF', 'pythonmodule')
+
+if PYTHONMODULE not in sys.path:
+    sys.path.append(PYTHONMODULE)
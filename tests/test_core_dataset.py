@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'mnc_NWDAF-main', 'NWDAF', 'pythonmodule'))
+
+core_dataset = pytest.importorskip('core_dataset')
+
+PERIOD = '03 Feb 2025 - 18 Feb 2025'
+
+
+def test_load_reads_the_csvs_until_converted(tmp_path):
+    """ Without a Parquet copy load() answers from the CSVs, with the same rows and types as after convert. """
+    query = dict(columns=['time', 'NrCellId', 'supi'], start='2025-02-05', end='2025-02-10',
+                 supi='imsi-208930000000002', source=PERIOD)
+    root = str(tmp_path / 'parquet')
+    from_csv = core_dataset.load('location', root=root, **query)
+    assert len(from_csv) and not os.path.exists(root)
+    assert str(from_csv['NrCellId'].dtype) == 'int32' and from_csv['time'].between('2025-02-05', '2025-02-10').all()
+
+    core_dataset.convert(out=root)
+    from_parquet = core_dataset.load('location', root=root, **query)
+    pd.testing.assert_frame_equal(from_csv, from_parquet, check_categorical=False)
+
+
+def test_join_leave_runs_without_parquet(tmp_path):
+    pytest.importorskip('matplotlib')
+    script = os.path.join(ROOT, 'core dataset', PERIOD, 'join_leave.py')
+    env = dict(os.environ, NWDAF_PARQUET_DIR=str(tmp_path / 'parquet'), MPLBACKEND='Agg')
+    result = subprocess.run([sys.executable, script], cwd=tmp_path, env=env, capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stderr
+    assert (tmp_path / 'handover_routes.png').exists()
@@ -0,0 +1,91 @@
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import prom_query
+
+EVENT_TIMES = ['2025-03-03 08:00:00', '2025-03-03 10:00:00', '2025-03-03 12:00:00']
+
+
+def utc(text):
+    return datetime.fromisoformat(text).replace(tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def prometheus(monkeypatch):
+    """ Every event series is still exported, whatever window is asked for. """
+    location = [{'__name__': 'UE_location_report', 'time': f'{t}.000000000 +0000 UTC',
+                 'NrCellId': f'00000000{i + 1}', 'supi': 'imsi-208930000000001', 'tac': '000001'}
+                for i, t in enumerate(EVENT_TIMES)]
+    # visit timestamps are written in local time, UTC+4
+    destination = [{'metric': {'__name__': 'ue_destination_visits_total',
+                               'timestamp': f'{utc(t) + prom_query.VISIT_LOCAL_TIME:%Y-%m-%d %H:%M:%S}',
+                               'supi': '208930000000001', 'location_type': kind, 'duration': '30',
+                               'time_of_day': 'morning'},
+                    'values': [[utc('2025-03-03 13:00:00').timestamp(), '1']]}
+                   for t, kind in zip(EVENT_TIMES, ['home', 'work', 'gym'])]
+    monkeypatch.setattr(prom_query, 'EVENT_SOURCE', 'prometheus')
+    monkeypatch.setattr(prom_query, 'series_query', lambda match, start, end: location)
+    monkeypatch.setattr(prom_query, 'range_query', lambda query, start_time, end_time, step: destination)
+    prom_query.clear_cache()
+    yield
+    prom_query.clear_cache()
+
+
+def test_location_window_keeps_only_events_inside(prometheus):
+    df = prom_query.location_frame(utc('2025-03-03 09:00:00'), utc('2025-03-03 11:00:00'), labels_only=True)
+    assert df['NrCellId'].tolist() == [2]
+    # display shift of +4h on the returned times
+    assert df['time'].tolist() == [datetime(2025, 3, 3, 14, 0)]
+
+
+def test_location_window_after_a_wider_cached_fetch(prometheus):
+    assert len(prom_query.location_frame(utc('2025-03-03 07:00:00'), utc('2025-03-03 13:00:00'))) == 3
+    df = prom_query.location_frame(utc('2025-03-03 11:00:00'), utc('2025-03-03 13:00:00'))
+    assert df['NrCellId'].tolist() == [3]
+
+
+def test_location_window_from_range_query(prometheus, monkeypatch):
+    monkeypatch.setattr(prom_query, 'range_query', lambda query, start_time, end_time, step: [
+        {'metric': labels, 'values': [[utc('2025-03-03 13:00:00').timestamp(), '1']]}
+        for labels in prom_query.series_query(query, start_time, end_time)])
+    df = prom_query.location_frame(utc('2025-03-03 09:00:00'), utc('2025-03-03 13:00:00'), labels_only=False)
+    assert df['NrCellId'].tolist() == [2, 3]
+
+
+def test_destination_window_keeps_only_events_inside(prometheus):
+    df = prom_query.destination_frame(utc('2025-03-03 09:00:00'), utc('2025-03-03 11:00:00'))
+    assert df['location_type'].tolist() == ['work']
+
+
+def test_cached_range_keeps_every_concurrent_fetch():
+    """ Overlapping tool calls on one metric must not drop each other's merged rows. """
+    import threading
+    import time
+
+    import pandas as pd
+
+    def fetch_raw(start_time, end_time):
+        time.sleep(0.01)
+        hours = range(int(start_time.timestamp() // 3600), int(end_time.timestamp() // 3600) + 1)
+        return pd.DataFrame({'sample_time': [h * 3600.0 for h in hours]})
+
+    prom_query.clear_cache()
+    base = utc('2025-03-03 00:00:00')
+    windows = [(base + pd.Timedelta(hours=h), base + pd.Timedelta(hours=h + 1)) for h in range(0, 48, 3)]
+    threads = [threading.Thread(target=prom_query.cached_range, args=('metric', fetch_raw, start, end, ['sample_time']))
+               for start, end in windows]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # every call widened the same entry; a lost merge leaves it narrower
+    entry = prom_query._cache['metric']
+    assert (entry['start'], entry['end']) == (windows[0][0].timestamp(), windows[-1][1].timestamp())
+    hours = entry['frame']['sample_time'].sort_values()
+    assert hours.tolist() == [base.timestamp() + h * 3600 for h in range(0, 47)]
+    prom_query.clear_cache()
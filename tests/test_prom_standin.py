@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import prom_standin
+
+
+def test_event_time_labels_follow_the_clock(tmp_path):
+    """ Shifted and sped-up replays label each event with the wall time its series appears at. """
+    trace = tmp_path / 'df_0001.csv'
+    trace.write_text('time,NrCellId,supi,tac\n'
+                     '2025-03-03 12:00:00.000000000,000000001,208930000000001,000001\n'
+                     '2025-03-03 13:00:00.000000000,000000002,208930000000001,000001\n')
+    data = prom_standin.Dataset(str(trace))
+    clock = prom_standin.Clock(data.end + 60, speed=60)
+    api = prom_standin.API(data, clock)
+
+    labels = api.series({'match[]': ['UE_location_report']})
+    label_times = pd.to_datetime([l['time'].removesuffix(' +0000 UTC') for l in labels])
+    wall = pd.to_datetime(clock.to_wall([s.times[0] for s in data.series['UE_location_report']]), unit='s')
+    assert (abs(label_times - wall) < pd.Timedelta(milliseconds=1)).all()
+    # the second event appeared one data hour = one wall minute after the first
+    assert label_times[1] - label_times[0] == pd.Timedelta(minutes=1)
+    matrix = api.query_range({'query': 'UE_location_report', 'start': clock.to_wall(data.end) - 30,
+                              'end': clock.to_wall(data.end + 60), 'step': '1s'})['result']
+    assert [entry['metric']['time'] for entry in matrix] == [l['time'] for l in labels]
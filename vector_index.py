@@ -0,0 +1,145 @@
+# vector_index.py
+#
+# Cosine top-k search over a fixed set of vectors (the intent embeddings of
+# LLM1.py). Vectors are L2-normalized once when the index is built, so a
+# query costs one matrix-vector product plus an argpartition for the k best
+# rows, instead of re-normalizing every vector and sorting all scores.
+#
+# Two modes:
+#   exact   every row is scored (default; right for catalogs up to ~100k)
+#   ivf     coarse-quantized: spherical k-means splits the rows into `nlist`
+#           lists and a query scores only the `nprobe` closest lists
+#
+#   python3 vector_index.py [--rows 100000] [--dim 1536]   # latency and IVF recall on synthetic data
+
+import argparse
+import time
+
+import numpy as np
+
+IVF_MIN_ROWS = 100_000      # nlist='auto' switches to IVF from this many rows
+NPROBE = 8
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 50_000      # rows the centroids are trained on
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+def _top_k(scores, k):
+    """ Column indices of the k highest scores per row, best first. """
+    k = min(k, scores.shape[1])
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(part, order, axis=1)
+
+
+class VectorIndex:
+
+    def __init__(self, vectors, nlist=None, nprobe=NPROBE, seed=0):
+        """
+        `vectors` is an (n, d) array (a memory-mapped one is fine; it is
+        copied once while normalizing). `nlist` is the number of IVF lists,
+        'auto' for sqrt(n) from IVF_MIN_ROWS rows on, or None for exact search.
+        """
+        self.vectors = normalize(vectors)
+        if nlist == 'auto':
+            nlist = int(np.sqrt(len(self.vectors))) if len(self.vectors) >= IVF_MIN_ROWS else None
+        self.nlist = nlist
+        self.nprobe = nprobe
+        if nlist:
+            self._train(nlist, np.random.default_rng(seed))
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def _train(self, nlist, rng):
+        """ Spherical k-means centroids and the rows of each list. """
+        sample = self.vectors[rng.choice(len(self.vectors), min(len(self.vectors), KMEANS_SAMPLE), replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+        for _ in range(KMEANS_ITERATIONS):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = sample[rng.choice(len(sample), empty.sum(), replace=False)]
+            centroids = normalize(sums)
+        self.centroids = centroids
+        assign = np.concatenate([np.argmax(chunk @ centroids.T, axis=1)
+                                 for chunk in np.array_split(self.vectors, max(1, len(self.vectors) // 65536))])
+        self.order = np.argsort(assign, kind='stable')
+        self.offsets = np.searchsorted(assign[self.order], np.arange(nlist + 1))
+
+    def search(self, queries, k=3):
+        """
+        Top-k cosine matches for one query vector (d,) or a batch (q, d).
+        Returns (indices, scores) as (q, k) arrays, best first.
+        """
+        queries = normalize(np.atleast_2d(queries))
+        if not self.nlist:
+            scores = queries @ self.vectors.T
+            indices = _top_k(scores, k)
+            return indices, np.take_along_axis(scores, indices, axis=1)
+        probes = _top_k(queries @ self.centroids.T, self.nprobe)
+        indices = np.zeros((len(queries), k), dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for i, (query, lists) in enumerate(zip(queries, probes)):
+            rows = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in lists])
+            row_scores = self.vectors[rows] @ query
+            best = _top_k(row_scores[None, :], k)[0]
+            indices[i, :len(best)], scores[i, :len(best)] = rows[best], row_scores[best]
+        return indices, scores
+
+
+def _bench(rows, dim, queries, k, repeat=5):
+    rng = np.random.default_rng(0)
+    # clustered data, closer to real embeddings than uniform noise
+    centers = rng.standard_normal((max(rows // 100, 1), dim)).astype(np.float32)
+    data = centers[rng.integers(len(centers), size=rows)] + 0.5 * rng.standard_normal((rows, dim)).astype(np.float32)
+    batch = data[rng.integers(rows, size=queries)] + 0.3 * rng.standard_normal((queries, dim)).astype(np.float32)
+
+    def timed(fn):
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn()
+            runs.append(time.perf_counter() - start)
+        return min(runs) * 1e3, result
+
+    def baseline():     # what LLM1 did per query: normalize everything, full argsort
+        out = []
+        for query in batch:
+            scores = (data @ query) / (np.linalg.norm(data, axis=1) * np.linalg.norm(query))
+            out.append(scores.argsort()[-k:][::-1])
+        return np.array(out)
+
+    exact = VectorIndex(data)
+    base_ms, truth = timed(baseline)
+    single_ms, _ = timed(lambda: [exact.search(q, k) for q in batch])
+    batch_ms, (found, _) = timed(lambda: exact.search(batch, k))
+    print(f"{rows} x {dim}, {queries} queries, k={k}")
+    print(f"  normalize + argsort per query {base_ms / queries:9.3f} ms/query")
+    print(f"  exact, one query at a time    {single_ms / queries:9.3f} ms/query   same top-k: {np.array_equal(found, truth)}")
+    print(f"  exact, batched                {batch_ms / queries:9.3f} ms/query")
+    start = time.perf_counter()
+    ivf = VectorIndex(data, nlist='auto' if rows >= IVF_MIN_ROWS else int(np.sqrt(rows)))
+    train_s = time.perf_counter() - start
+    for nprobe in (4, NPROBE, 16):
+        ivf.nprobe = nprobe
+        ivf_ms, (approx, _) = timed(lambda: ivf.search(batch, k))
+        recall = np.mean([len(set(a) & set(t)) / k for a, t in zip(approx, truth)])
+        print(f"  ivf nlist={ivf.nlist} nprobe={nprobe:<3}      {ivf_ms / queries:9.3f} ms/query   "
+              f"recall@{k} {recall:.3f}  (trained in {train_s:.1f}s)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark VectorIndex against per-query normalize + argsort.")
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--dim', type=int, default=1536)
+    parser.add_argument('--queries', type=int, default=64)
+    parser.add_argument('--k', type=int, default=3)
+    args = parser.parse_args()
+    _bench(args.rows, args.dim, args.queries, args.k)